@@ -0,0 +1,107 @@
+"""Micro-benchmark of the per-story dispatch overhead in storyminer.miner
+
+Compares the former exec/eval string dispatch (copied below) to the accessor tables that replaced it,
+on stand-in stories so that no NLP model is needed. Usage: python benchmarks/bench_dispatch.py [-n NUMBER]
+"""
+import os
+import sys
+import timeit
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storyminer.miner import DOCS, PARTS, MinerUtility, _get, me_get
+
+class Token(object):
+	def __init__(self, i):
+		self.i = i
+
+class Part(object):
+	def __init__(self, n):
+		self.doc = [Token(i) for i in range(n)]
+		self.free_form = self.doc[1:]
+		self.verbs = self.doc[1:3]
+		self.nouns = self.doc[3:]
+
+class Story(object):
+	def __init__(self, n=12):
+		self.doc = [Token(i) for i in range(n)]
+		self.means = Part(n)
+		self.ends = Part(n)
+		self.has_ends = True
+
+class Steps:
+	"""Extraction steps that do no work, so that only the dispatch is timed"""
+	def get_subj(story, span):
+		return span
+
+	get_dobj = get_nouns = get_verbs = get_proper_nouns = get_noun_phrases = get_compound_nouns = get_phrasal_verbs = get_subj
+
+### Before: exec/eval string dispatch
+def old_get(story, assignment, method, source, part='means'):
+		exec("story.{0}.{1} = Steps.{2}(story, story.{0}.{3})".format(part, assignment, method, source))
+		return story
+
+def old_me_get(story, assignment, method, source):
+	story = old_get(story, assignment, method, source)
+	if story.has_ends:
+		story = old_get(story, assignment, method, source, part='ends')
+	return story
+
+def old_get_span(story, li, part='doc'):
+	ret = []
+	for i in [t.i for t in li]:
+		ret.append(eval('story.' + str(part))[i])
+	return ret
+
+def old_story(story, part='means'):
+	# get_mobj_and_mv
+	for _ in range(7):
+		eval('story.' + str(part) + '.doc')
+	eval('len(story.' + str(part) + '.doc)')
+	old_get_span(story, story.means.free_form, 'means.doc')
+	# get_free_form
+	old_me_get(story, 'nouns', 'get_subj', 'free_form')
+	old_me_get(story, 'nouns', 'get_dobj', 'free_form')
+	old_me_get(story, 'verbs', 'get_verbs', 'free_form')
+	old_get(story, 'phrasal_verbs', 'get_phrasal_verbs', 'verbs')
+	old_get(story, 'phrasal_verbs', 'get_phrasal_verbs', 'verbs', part='ends')
+	old_me_get(story, 'nouns', 'get_nouns', 'free_form')
+	for p in ['means', 'ends']:
+		old_get(story, 'proper_nouns', 'get_proper_nouns', 'nouns', part=p)
+		old_get(story, 'noun_phrases', 'get_noun_phrases', 'free_form', part=p)
+		old_get(story, 'compounds', 'get_compound_nouns', 'free_form', part=p)
+
+### After: accessor tables
+phrases = {'means': len, 'ends': len}
+
+def new_story(story, part='means'):
+	# get_mobj_and_mv
+	doc = PARTS[part](story).doc
+	phrases[part](doc)
+	MinerUtility.get_span(story, story.means.free_form, 'means.doc')
+	# get_free_form
+	me_get(story, 'nouns', Steps.get_subj, 'free_form')
+	me_get(story, 'nouns', Steps.get_dobj, 'free_form')
+	me_get(story, 'verbs', Steps.get_verbs, 'free_form')
+	_get(story, 'phrasal_verbs', Steps.get_phrasal_verbs, 'verbs')
+	_get(story, 'phrasal_verbs', Steps.get_phrasal_verbs, 'verbs', part='ends')
+	me_get(story, 'nouns', Steps.get_nouns, 'free_form')
+	for p in ['means', 'ends']:
+		_get(story, 'proper_nouns', Steps.get_proper_nouns, 'nouns', part=p)
+		_get(story, 'noun_phrases', Steps.get_noun_phrases, 'free_form', part=p)
+		_get(story, 'compounds', Steps.get_compound_nouns, 'free_form', part=p)
+
+def main(number):
+	story = Story()
+	before = min(timeit.repeat(lambda: old_story(story), number=number, repeat=3)) / number
+	after = min(timeit.repeat(lambda: new_story(story), number=number, repeat=3)) / number
+	print("Dispatch cost per story ({} stories):".format(number))
+	print("  exec/eval:\t\t{:8.2f} us".format(before * 1e6))
+	print("  accessor tables:\t{:8.2f} us".format(after * 1e6))
+	print("  speedup:\t\t{:8.1f}x".format(before / after))
+
+if __name__ == "__main__":
+	p = ArgumentParser(description="Micro-benchmark of exec/eval versus accessor table dispatch")
+	p.add_argument("-n", "--number", type=int, default=2000, help="number of stories to time")
+	main(p.parse_args().number)
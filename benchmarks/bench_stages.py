@@ -0,0 +1,150 @@
+"""Stage timings of mining synthetic corpora
+
+Generates corpora of user stories (see generate.py) and mines them in windows as mine_batch does, timing
+separately: finding the indicators, parsing, StoryMiner (structure and extract, without parsing), toJSON and
+Writer. With --stub, a rule-based pipeline (see stubnlp.py) replaces the model, so that the miner itself can be
+benchmarked. The results are written as JSON, so that runs can be compared over time.
+Usage: python benchmarks/bench_stages.py [--sizes 1000,10000] [--stub | -m MODEL] [--ends RATIO] [--malformed RATIO] [-o FILE]
+"""
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from generate import Generator
+from storyminer.io import Writer
+from storyminer.miner import StoryMiner
+from storyminer.nlp import load, DEFAULT_MODEL
+from storyminer.pipeline import DEFAULT_BATCH_SIZE, normalize, part_texts, pipe
+from storyminer.userstory import UserStory, UserStorySet, FailedUserStory
+
+STAGES = ['get_indicators', 'parse', 'mine', 'toJSON', 'write']
+
+class Timer(object):
+	def __init__(self):
+		self.times = dict.fromkeys(STAGES, 0.0)
+		self.stage = None
+
+	def start(self, stage):
+		self.stop()
+		self.stage = stage
+		self.started = time.perf_counter()
+
+	def stop(self):
+		if self.stage:
+			self.times[self.stage] += time.perf_counter() - self.started
+			self.stage = None
+
+def run(stories, nlp, miner, userstoryset, window, batch_size, outdir):
+	"""Mines user stories window by window, timing each stage
+
+	:param stories: List of (ID, text) pairs
+	:param userstoryset: UserStorySet to export each window with
+	:param window: Number of user stories per window
+	:param outdir: Directory to write the output to
+	:returns: Tuple of the seconds per stage and the number of failed user stories
+	"""
+	timer = Timer()
+	writer = Writer()
+	failed = 0
+	for w in range(0, len(stories), window):
+		chunk = stories[w:w + window]
+		results = [UserStory(id, text.rstrip(), normalize(text)) for id, text in chunk]
+
+		timer.start('get_indicators')
+		indicators = [miner.matcher.match(us.sentence) for us in results]
+		for us, found in zip(results, indicators):
+			miner.get_indicators(us, found)
+
+		timer.start('parse')
+		docs = pipe(nlp, [us.sentence for us in results], batch_size)
+
+		timer.start('mine')
+		parts = []
+		for i, (us, doc) in enumerate(zip(results, docs)):
+			us.doc = doc
+			try:
+				miner.structure(us, indicators[i])
+			except ValueError as e:
+				results[i] = FailedUserStory(us.id, chunk[i][1], str(e.args[0]))
+				continue
+			us.old_doc = us.doc
+			miner.get_part_text(us)
+			parts.extend(part_texts(us))
+
+		timer.start('parse')
+		for (part, _), doc in zip(parts, pipe(nlp, [t for _, t in parts], batch_size)):
+			part.doc = doc
+
+		timer.start('mine')
+		for i, us in enumerate(results):
+			if type(us) is FailedUserStory:
+				continue
+			try:
+				miner.extract(us)
+			except ValueError as e:
+				results[i] = FailedUserStory(us.id, chunk[i][1], str(e.args[0]))
+
+		timer.start('toJSON')
+		userstoryset.set = results
+		output = userstoryset.toJSON()
+
+		timer.start('write')
+		writer.make_file(outdir, "Benchmark", "json", output)
+		timer.stop()
+
+		failed += sum(1 for us in results if type(us) is FailedUserStory)
+	return timer.times, failed
+
+def versions():
+	import spacy
+	return {'python': platform.python_version(), 'spacy': spacy.__version__, 'platform': platform.platform()}
+
+def program(*args):
+	p = ArgumentParser(description="Time the stages of mining synthetic user stories")
+	p.add_argument("--sizes", default="1000,10000", help="comma-separated corpus sizes, e.g. 1000,10000,100000,1000000 (default: %(default)s)")
+	p.add_argument("--ends", type=float, default=0.5, help="share of user stories with ends (default: %(default)s)")
+	p.add_argument("--malformed", type=float, default=0.05, help="share of malformed lines (default: %(default)s)")
+	p.add_argument("--seed", type=int, default=0, help="random seed (default: %(default)s)")
+	p.add_argument("-m", "--model", default=DEFAULT_MODEL, help="spaCy model (default: %(default)s)")
+	p.add_argument("--stub", action="store_true", help="use the rule-based stub pipeline instead of a model")
+	p.add_argument("--window", type=int, default=10000, help="user stories mined and written at a time (default: %(default)s)")
+	p.add_argument("-b", "--batch_size", type=int, default=DEFAULT_BATCH_SIZE, help="nlp.pipe batch size (default: %(default)s)")
+	p.add_argument("-o", "--output", help="JSON file to write the results to (default: output/benchmarks/<time>.json)")
+	args = p.parse_args(args or None)
+
+	if args.stub:
+		import stubnlp
+		nlp = stubnlp.load()
+	else:
+		nlp = load(args.model)
+	userstoryset = UserStorySet(nlp, "Benchmark")
+	miner = StoryMiner(userstoryset.system)
+
+	report = dict(versions(), started=datetime.now().isoformat(timespec='seconds'), model=nlp.meta.get('name'),
+		stub=args.stub, ends=args.ends, malformed=args.malformed, seed=args.seed, window=args.window,
+		batch_size=args.batch_size, runs=[])
+	print("{:>9} {:>8} ".format("stories", "failed") + " ".join("{:>14}".format(s) for s in STAGES) + "   (us/story)")
+	for size in [int(s) for s in args.sizes.split(",")]:
+		stories = list(enumerate(Generator(args.ends, args.malformed, args.seed).generate(size), 1))
+		with tempfile.TemporaryDirectory() as outdir:
+			times, failed = run(stories, nlp, miner, userstoryset, args.window, args.batch_size, outdir)
+		report['runs'].append({'stories': size, 'failed': failed, 'seconds': times,
+			'us_per_story': {stage: times[stage] / size * 1e6 for stage in STAGES}})
+		print("{:>9} {:>8} ".format(size, failed) + " ".join("{:>14.1f}".format(times[s] / size * 1e6) for s in STAGES))
+
+	output = args.output or os.path.join(ROOT, "output", "benchmarks", "{}.json".format(datetime.now().strftime("%Y%m%d-%H%M%S")))
+	os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+	with open(output, 'w') as f:
+		json.dump(report, f, indent=4)
+	print("Results written to", output)
+
+if __name__ == "__main__":
+	program(*sys.argv[1:])
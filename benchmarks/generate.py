@@ -0,0 +1,119 @@
+"""Synthetic user story generator
+
+Generates "As a <role>, I want to <action>, so that <benefit>" lines from the indicators in
+lang/en/indicators.py, with a configurable share of user stories with ends and of malformed lines.
+Usage: python benchmarks/generate.py [-n NUMBER] [--ends RATIO] [--malformed RATIO] [--seed SEED] > stories.txt
+"""
+import os
+import random
+import sys
+from argparse import ArgumentParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lang.en.indicators import ROLE_INDICATORS, MEANS_INDICATORS, ENDS_INDICATORS
+
+ROLES = ["Visitor", "user", "administrator", "Event Organizer", "content manager", "customer", "editor", "guest",
+	"account owner", "moderator", "Site Admin", "developer", "sales representative", "teacher", "student", "auditor"]
+VERBS = ["create", "edit", "delete", "view", "search for", "filter", "export", "upload", "share", "book", "cancel",
+	"log in to", "sign up for", "review", "approve", "print", "download", "archive", "subscribe to", "look up"]
+ADJECTIVES = ["new", "personal", "old", "current", "multiple", "purchased", "secure", "public", "monthly", "shared"]
+OBJECTS = ["account", "event", "ticket", "report", "profile", "invoice", "order", "document", "message", "payment",
+	"settings", "newsletter", "event type", "ticket price", "product catalog", "user list", "password", "booking"]
+DETERMINERS = ["a", "the", "my", "every", "each", "their"]
+REASONS = ["the deadline", "privacy rules", "a policy change", "the audit", "security concerns", "a complaint"]
+
+class Generator(object):
+	def __init__(self, ends_ratio=0.5, malformed_ratio=0.05, seed=0):
+		"""
+		:param ends_ratio: Share of well-formed user stories that have ends
+		:param malformed_ratio: Share of lines that are not well-formed user stories
+		:param seed: Seed of the random generator, so that corpora can be generated again
+		"""
+		self.ends_ratio = ends_ratio
+		self.malformed_ratio = malformed_ratio
+		self.random = random.Random(seed)
+
+	def choice(self, li):
+		return self.random.choice(li)
+
+	def thing(self):
+		words = [self.choice(DETERMINERS)]
+		if self.random.random() < 0.4:
+			words.append(self.choice(ADJECTIVES))
+		words.append(self.choice(OBJECTS))
+		if words[0] == "a" and words[1][0] in "aeiou":
+			words[0] = "an"
+		return " ".join(words)
+
+	def action(self):
+		return "{} {}".format(self.choice(VERBS), self.thing())
+
+	def role(self):
+		role = self.choice(ROLES)
+		indicator = self.choice(ROLE_INDICATORS)
+		if indicator != "As":
+			indicator = "As an" if role[0].lower() in "aeiou" else "As a"
+		return "{} {}".format(indicator, role)
+
+	def means(self):
+		indicator = self.choice(MEANS_INDICATORS)
+		return "{} {}".format(indicator, self.action())
+
+	def ends(self):
+		indicator = self.choice(ENDS_INDICATORS).lower()
+		if indicator == "because of":
+			return "{} {}".format(indicator, self.choice(REASONS))
+		elif indicator == "so":
+			return "so I can {}".format(self.action())
+		elif indicator == "so that":
+			return "so that I can {}".format(self.action())
+		return "{} {}".format(indicator, self.action())
+
+	def story(self):
+		"""Generates a well-formed user story
+
+		:returns: Text of the user story
+		"""
+		text = "{}, {}".format(self.role(), self.means())
+		if self.random.random() < self.ends_ratio:
+			text += ", " + self.ends()
+		return text + "."
+
+	def malformed(self):
+		"""Generates a line that is not a well-formed user story
+
+		:returns: Text without a role, without means, or without any indicator
+		"""
+		kind = self.random.randrange(3)
+		if kind == 0:
+			return "{}.".format(self.means())
+		elif kind == 1:
+			return "{}, {}.".format(self.role(), self.ends())
+		return "{} {}".format(self.choice(VERBS).capitalize(), self.thing())
+
+	def generate(self, n):
+		"""Generates lines of user stories
+
+		:param n: Number of lines
+		:returns: Generator of texts
+		"""
+		for _ in range(n):
+			if self.random.random() < self.malformed_ratio:
+				yield self.malformed()
+			else:
+				yield self.story()
+
+def program(*args):
+	p = ArgumentParser(description="Generate synthetic user stories")
+	p.add_argument("-n", "--number", type=int, default=1000, help="number of user stories (default: %(default)s)")
+	p.add_argument("--ends", type=float, default=0.5, help="share of user stories with ends (default: %(default)s)")
+	p.add_argument("--malformed", type=float, default=0.05, help="share of malformed lines (default: %(default)s)")
+	p.add_argument("--seed", type=int, default=0, help="random seed (default: %(default)s)")
+	args = p.parse_args(args or None)
+
+	for line in Generator(args.ends, args.malformed, args.seed).generate(args.number):
+		print(line)
+
+if __name__ == "__main__":
+	program(*sys.argv[1:])
@@ -0,0 +1,71 @@
+"""Import-time check of the storyminer.py command line
+
+Runs storyminer.py with python -X importtime for --version, --help and a missing input file, which should
+not import spaCy, pandas or pyarrow. Prints the total import time and the slowest imports of every run, and exits
+with status 1 if a run imports a forbidden module or takes longer than the threshold, so that it can guard
+CI against regressions. Usage: python benchmarks/importtime.py [-t MILLISECONDS] [--top N]
+"""
+import os
+import subprocess
+import sys
+from argparse import ArgumentParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "storyminer.py")
+
+RUNS = [
+	["--version"],
+	["--help"],
+	["does-not-exist.txt"],
+]
+FORBIDDEN = ["spacy", "pandas", "pyarrow", "en_core_web_sm", "en_core_web_md", "en_core_web_lg"]
+
+def importtime(args):
+	"""Runs storyminer.py with -X importtime
+
+	:param args: Command line arguments of storyminer.py
+	:returns: List of (module, self microseconds, cumulative microseconds, depth)
+	"""
+	p = subprocess.run([sys.executable, "-X", "importtime", SCRIPT] + args, cwd=ROOT,
+		stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+	imports = []
+	for line in p.stderr.splitlines():
+		if not line.startswith("import time:") or "[us]" in line:
+			continue
+		own, cumulative, name = line[len("import time:"):].split("|")
+		depth = (len(name) - len(name.lstrip())) // 2
+		imports.append((name.strip(), int(own), int(cumulative), depth))
+	return imports
+
+def check(args, threshold, top, forbidden):
+	imports = importtime(args)
+	# Top-level imports include the time of the imports they cause
+	total = sum(cumulative for _, _, cumulative, depth in imports if depth == 0) / 1000
+	found = sorted(set(name.split(".")[0] for name, _, _, _ in imports) & set(forbidden))
+
+	print("storyminer.py {}: {:.1f} ms in {} imports".format(" ".join(args), total, len(imports)))
+	for name, own, cumulative, depth in sorted(imports, key=lambda i: i[1], reverse=True)[:top]:
+		print("  {:>8.1f} ms  {}".format(own / 1000, name))
+
+	failed = False
+	if found:
+		print("  FAIL: imports {}".format(", ".join(found)))
+		failed = True
+	if total > threshold:
+		print("  FAIL: {:.1f} ms is over the threshold of {} ms".format(total, threshold))
+		failed = True
+	return not failed
+
+def program(*args):
+	p = ArgumentParser(description="Check the import time of the storyminer.py command line")
+	p.add_argument("-t", "--threshold", type=float, default=250, help="maximum total import time per run in ms (default: %(default)s)")
+	p.add_argument("--top", type=int, default=5, help="number of slowest imports to print per run (default: %(default)s)")
+	p.add_argument("--allow", nargs="*", default=[], help="modules that may be imported after all", metavar="MODULE")
+	args = p.parse_args(args or None)
+
+	forbidden = [m for m in FORBIDDEN if m not in args.allow]
+	results = [check(run, args.threshold, args.top, forbidden) for run in RUNS]
+	return 0 if all(results) else 1
+
+if __name__ == "__main__":
+	sys.exit(program(*sys.argv[1:]))
@@ -0,0 +1,77 @@
+"""Memory per mined user story, for full user stories and their compact forms
+
+Mines the input file (repeated until there are N user stories) and measures with tracemalloc how many
+bytes each representation takes: the mined UserStory objects, compact stories with their doc bytes, and
+compact stories without docs. Also checks that compact stories export the same JSON.
+Usage: python benchmarks/story_memory.py [-n NUMBER] [-m MODEL] [INPUT FILE]
+"""
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from itertools import cycle, islice
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from storyminer.compact import compact
+from storyminer.io import Reader
+from storyminer.miner import StoryMiner
+from storyminer.nlp import load, DEFAULT_MODEL
+from storyminer.pipeline import mine
+from storyminer.userstory import UserStorySet
+
+def measure(stories, nlp, miner, convert):
+	"""Mines user stories and converts them, keeping only the converted ones
+
+	:returns: Tuple of the converted user stories and the bytes they take
+	"""
+	gc.collect()
+	before = tracemalloc.get_traced_memory()[0]
+	results = [convert(us) for us in mine(stories, nlp, miner)]
+	gc.collect()
+	return results, tracemalloc.get_traced_memory()[0] - before
+
+def check(full, compacted):
+	"""Counts the user stories of which the compact form exports different JSON"""
+	return sum(1 for a, b in zip(full, compacted) if json.loads(a.toJSON()) != json.loads(b.toJSON()))
+
+def program(*args):
+	p = ArgumentParser(description="Measure the memory per mined user story")
+	p.add_argument("filename", nargs="?", default=os.path.join(ROOT, "example_stories.txt"), help="input file with user stories", metavar="INPUT FILE")
+	p.add_argument("-n", "--number", type=int, default=1000, help="number of user stories (default: %(default)s)")
+	p.add_argument("-m", "--model", default=DEFAULT_MODEL, help="spaCy model (default: %(default)s)")
+	args = p.parse_args(args or None)
+
+	nlp = load(args.model)
+	# Without the part and role caches, as user stories would otherwise share the docs and roles cached when mining the
+	# first time, which are not counted
+	miner = StoryMiner(UserStorySet(nlp, "System").system, part_cache=0, role_cache=0)
+	lines = [text for _, text in Reader.stream(args.filename)]
+	stories = list(enumerate(islice(cycle(lines), args.number), 1))
+	# Mine once first, so that the strings of the vocab are not counted
+	full = list(mine(stories, nlp, miner))
+
+	tracemalloc.start()
+	# Name, conversion, and whether the export should equal that of the full user stories
+	representations = [
+		("UserStory", lambda us: us, False),
+		("CompactStory, with docs", lambda us: compact(us), True),
+		("CompactStory, no docs", lambda us: compact(us, keep_docs=False), False),
+	]
+	sizes = []
+	for name, convert, lossless in representations:
+		results, size = measure(stories, nlp, miner, convert)
+		sizes.append(size)
+		note = ", {} of {} exports differ".format(check(full, results), len(results)) if lossless else ""
+		print("{:<26} {:>10.0f} bytes/story{}".format(name, size / args.number, note))
+		del results
+	tracemalloc.stop()
+
+	for (name, _, _), size in zip(representations[1:], sizes[1:]):
+		print("{}: {:.1%} of UserStory".format(name, size / sizes[0]))
+
+if __name__ == "__main__":
+	program(*sys.argv[1:])
@@ -0,0 +1,120 @@
+"""Rule-based stand-in for a trained spaCy pipeline
+
+A blank English pipeline with one component that sets POS tags, tags, lemmas and a simple dependency
+tree by word lists, so that the miner can be benchmarked without loading a model. The annotations are
+plausible for generated user stories, not accurate.
+"""
+import spacy
+from spacy.language import Language
+from spacy.tokens import Doc
+
+PRON = {'i', 'me', 'it', 'they', 'we', 'you', 'he', 'she', 'them', 'us'}
+DET = {'a', 'an', 'the', 'my', 'that', 'this', 'these', 'those', 'all', 'each', 'every', 'their', 'his', 'her', 'our', 'your', 'its', 'some', 'any'}
+AUX = {'can', 'am', 'will', 'would', "'m", 'be', 'is', 'are', 'should', 'could', 'may', 'must'}
+ADP = {'for', 'of', 'on', 'in', 'with', 'from', 'by', 'about', 'at', 'into', 'via', 'after', 'before', 'per'}
+PART = {'up', 'down', 'off', 'out', 'away'}
+ADJ = {'new', 'multiple', 'personal', 'purchased', 'only', 'able', 'old', 'current', 'other', 'own', 'easy', 'secure', 'public', 'monthly', 'shared'}
+CONJ = {'and', 'or', 'so', 'because', 'that', 'if', 'when'}
+# Words after which a word is taken to be a verb
+BEFORE_VERB = AUX | {'to', 'i', 'want', 'wish', 'like'}
+
+@Language.component("storyminer_stub")
+def annotate(doc):
+	words = [t.text for t in doc]
+	pos, tags, lemmas = tag(words)
+	heads, deps = parse(pos, tags)
+	return Doc(doc.vocab, words=words, spaces=[bool(t.whitespace_) for t in doc], pos=pos, tags=tags, lemmas=lemmas,
+		heads=heads, deps=deps)
+
+def tag(words):
+	pos, tags, lemmas = [], [], []
+	for i, word in enumerate(words):
+		l = word.lower()
+		lemma = l
+		prev = words[i - 1].lower() if i > 0 else None
+		if l in PRON:
+			p, t = 'PRON', 'PRP'
+		elif l in AUX:
+			p, t = 'VERB', 'MD'
+		elif l in DET:
+			p, t = 'DET', 'DT'
+		elif l in CONJ:
+			p, t = 'CCONJ', 'CC'
+		elif l in PART and i > 0 and pos[-1] == 'VERB':
+			p, t = 'PART', 'RP'
+		elif l == 'to':
+			p, t = 'PART', 'TO'
+		elif l in ADP:
+			p, t = 'ADP', 'IN'
+		elif l in ADJ:
+			p, t = 'ADJ', 'JJ'
+		elif prev in BEFORE_VERB:
+			p, t = 'VERB', 'VB'
+		elif word[:1].isupper() and i > 0:
+			p, t = 'PROPN', 'NNP'
+		else:
+			p, t = 'NOUN', 'NNS' if l.endswith('s') else 'NN'
+			if l.endswith('s') and len(l) > 3:
+				lemma = l[:-1]
+		pos.append(p)
+		tags.append(t)
+		lemmas.append(lemma)
+	return pos, tags, lemmas
+
+def parse(pos, tags):
+	# The first verb is the root, later verbs depend on the verb before them, and nouns on the verb or preposition before them
+	n = len(pos)
+	if not n:
+		return [], []
+	verbs = [i for i in range(n) if pos[i] == 'VERB' and tags[i] != 'MD']
+	nouns = [i for i in range(n) if pos[i] in ('NOUN', 'PROPN')]
+	root = verbs[0] if verbs else nouns[-1] if nouns else 0
+	heads = [root] * n
+	deps = ['dep'] * n
+	deps[root] = 'ROOT'
+	last_verb = root
+	last_prep = None
+	for i in range(n):
+		if i == root:
+			continue
+		next_verbs = [v for v in verbs if v > i]
+		next_nouns = [v for v in nouns if v > i]
+		if pos[i] == 'VERB' and tags[i] != 'MD' and i > root:
+			deps[i], heads[i] = 'xcomp', last_verb
+			last_verb = i
+			last_prep = None
+		elif pos[i] == 'VERB':
+			deps[i] = 'aux'
+		elif pos[i] == 'PRON' and i < root:
+			deps[i] = 'nsubj'
+		elif pos[i] == 'PART' and tags[i] == 'TO':
+			deps[i], heads[i] = 'aux', next_verbs[0] if next_verbs else root
+		elif pos[i] == 'PART':
+			deps[i], heads[i] = 'prt', last_verb
+		elif pos[i] == 'ADP':
+			deps[i], heads[i] = 'prep', last_verb
+			last_prep = i
+		elif pos[i] in ('DET', 'ADJ'):
+			deps[i] = 'det' if pos[i] == 'DET' else 'amod'
+			heads[i] = next_nouns[0] if next_nouns else root
+		elif pos[i] in ('NOUN', 'PROPN', 'PRON'):
+			if i + 1 < n and pos[i + 1] in ('NOUN', 'PROPN'):
+				deps[i], heads[i] = 'compound', i + 1
+			elif last_prep is not None:
+				deps[i], heads[i] = 'pobj', last_prep
+				last_prep = None
+			elif i < root:
+				deps[i] = 'nsubj'
+			else:
+				deps[i], heads[i] = 'dobj', last_verb
+	return heads, deps
+
+def load():
+	"""Creates the stub pipeline
+
+	:returns: Natural Language Processor (spaCy)
+	"""
+	nlp = spacy.blank("en")
+	nlp.add_pipe("storyminer_stub")
+	nlp.meta['name'] = "stub"
+	return nlp
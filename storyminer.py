@@ -6,90 +6,346 @@ import os.path
 import timeit
 import json
 from argparse import ArgumentParser
+from contextlib import nullcontext
 
-import spacy
-import en_core_web_md
-
-from storyminer.io import Reader, Writer
-from storyminer.miner import StoryMiner
-from storyminer.userstory import UserStorySet, UserStory, FailedUserStory
-from storyminer.utility import Printer, remove_punct
+# Only light modules are imported here, so that --help, --version and argument errors do not load spaCy
+from storyminer.cache import DEFAULT_MAX_SIZE, DEFAULT_PART_CACHE, DEFAULT_ROLE_CACHE
+from storyminer.client import DEFAULT_ADDRESS, SERVER_ENV
+from storyminer.matrix import DEFAULT_BASE, DEFAULT_THRESHOLD, DEFAULT_TOP
+from storyminer.columnar import DEFAULT_CHUNK_SIZE, FORMATS, has_pyarrow
+from storyminer.nlp import DEFAULT_MODEL
+from storyminer.ontology import SYNTAXES
+from storyminer.pipeline import KEEP_DOCS
 
 verbose = False
-vprint = print if verbose else lambda *a, **k: None
 
-def main(filename, systemname, export):
+def vprint(*args, **kwargs):
+	if verbose:
+		print(*args, **kwargs)
+
+def main(filename, systemname, export, batch_size=None, single_parse=False, compare_parse=False, workers=None, line_ids=False,
+		ndjson=False, flush_every=None, docbin=False, cache_dir=None, cache_size=DEFAULT_MAX_SIZE, clear_cache=False,
+		previous=None, model=DEFAULT_MODEL, server=None, keep_docs='all', timings=False, profile=False, profile_sample=1,
+		dedup=False, part_cache=DEFAULT_PART_CACHE, role_cache=DEFAULT_ROLE_CACHE, stats=False,
+		columnar=False, columnar_format=None, chunk_size=DEFAULT_CHUNK_SIZE, matrix=False, base=DEFAULT_BASE,
+		threshold=DEFAULT_THRESHOLD, top=DEFAULT_TOP, ontology=None):
 	"""General class to run the entire program
+
+	:param batch_size: If set, parse the user stories with nlp.pipe in batches of this size
+	:param single_parse: Parse the parts of every user story at once, instead of once per part
+	:param compare_parse: Print how often single-parse mining differs from the default mining
+	:param workers: If set, mine in this many worker processes
+	:param line_ids: Use line numbers of the input file as user story IDs
+	:param ndjson: Write every user story to a JSON lines file as soon as it is mined, instead of keeping them
+	:param flush_every: Number of user stories after which the JSON lines file is flushed
+	:param docbin: Write all docs to a binary DocBin sidecar file, and refer to them by index in the JSON
+	:param cache_dir: If set, keep parsed docs in a persistent cache in this directory
+	:param cache_size: Maximum size of the parse cache in bytes
+	:param clear_cache: Empty the parse cache before mining
+	:param previous: If set, output file of an earlier run, of which the unchanged user stories are carried over instead of mined
+	:param model: spaCy model to use, by size (sm, md or lg) or package name
+	:param server: Address of a running mining server to use, instead of loading the model (see storyminer.client)
+	:param keep_docs: Which docs to keep after a user story is mined: 'all', 'parts' (role, means and ends) or 'none'
+	:param timings: Time every stage per user story, and write a report of the timings next to the output (see storyminer.instrument)
+	:param profile: Profile mining with cProfile and tracemalloc, and write the statistics next to the output (see storyminer.profiling)
+	:param profile_sample: Profile one in this many user stories
+	:param dedup: Mine user stories with the same normalized text once, and copy the result to the others (see storyminer.pipeline.dedupe)
+	:param part_cache: Number of parsed role, means and ends texts to keep in memory, see StoryMiner
+	:param role_cache: Number of functional roles to keep in memory by role text
+	:param stats: Print statistics of the mined user stories and write them to CSV files (see storyminer.stats)
+	:param columnar: Write the mined fields of every user story to a flat Parquet or CSV file as it is mined (see storyminer.columnar)
+	:param columnar_format: 'parquet' or 'csv', by default Parquet if pyarrow is installed
+	:param chunk_size: Number of user stories per chunk of the columnar file
+	:param matrix: Build the factor matrix of the terms of the mined user stories, and write the terms above the threshold to a CSV file (see storyminer.matrix)
+	:param base: Weight that the absolute weights of the factor matrix are multiplied by
+	:param threshold: Lowest summed weight of the terms to write
+	:param top: Number of terms with the highest weight to print
+	:param ontology: If set, 'turtle' or 'manchester', write an OWL ontology of the mined user stories in that syntax as they are mined (see storyminer.ontology)
 	"""
+	from storyminer.client import server_address
+	from storyminer.io import Reader, Writer
+
+	# Read the input file as it is mined
+	stories = Reader.stream(filename, renumber=not line_ids)
+
+	# Mine on a running server if there is one, unless options are given that only local mining has
+	address = server_address(server)
+	local = [name for name, value in [('--ndjson', ndjson), ('--docbin', docbin), ('--previous', previous),
+		('--compare-parse', compare_parse), ('--stats', stats), ('--columnar', columnar), ('--matrix', matrix),
+		('--ontology', ontology), ('--timings', timings), ('--profile', profile), ('--workers', workers),
+		('--batch-size', batch_size), ('--single-parse', single_parse), ('--keep-docs', keep_docs != 'all'),
+		('--cache', cache_dir), ('--dedup', dedup)] if value]
+	if address and local:
+		print("Not using mining server at {}, mining locally for {}".format(address, ", ".join(local)))
+	elif address:
+		stories = list(stories)
+		result = main_remote(address, stories, systemname, export, model)
+		if result is not None:
+			return result
+
+	from storyminer.cache import ParseCache, CachedNLP
+	from storyminer.docstore import DocSidecar
+	from storyminer.incremental import load_previous, remine, ChangeSummary
+	from storyminer.instrument import Instrument, NO_INSTRUMENT
+	from storyminer.matrix import FactorMatrix
+	from storyminer.miner import StoryMiner
+	from storyminer.nlp import load, model_name
+	from storyminer.ontology import OntologyWriter, EXTENSIONS
+	from storyminer.pipeline import mine, mine_batch, retain, dedupe, compare_single, Duplicates
+	from storyminer.profiling import Profiler
+	from storyminer.stats import Statistics, TableBuilder
+	from storyminer.userstory import UserStorySet, FailedUserStory
+	from storyminer.utility import Printer, peak_rss
+	from storyminer.workers import mine_parallel
 
 	## 1) Initialize spaCy just once (this takes most of the time...)
 	vprint("Initializing Natural Language Processor ({}) . . .".format("spaCy"))
 	start = timeit.default_timer()
 
-	nlp = en_core_web_md.load()
+	nlp = load(model)
 	nlp_time = timeit.default_timer() - start
 	status("Initialized", nlp_time)
+	rss = peak_rss()
+	print("Loaded {} ({}) in {:.2f}s{}".format(model_name(model), ", ".join(nlp.pipe_names), nlp_time,
+		", peak RSS {:.0f} MB".format(rss) if rss else ""))
+
+	cache = None
+	if cache_dir:
+		cache = ParseCache(cache_dir, nlp, cache_size)
+		if clear_cache:
+			cache.clear()
+		nlp = CachedNLP(nlp, cache)
 
 	## 2) Mining
 	start_ = timeit.default_timer()
+	instrument = Instrument() if timings else NO_INSTRUMENT
+	stories = instrument.timed('read', stories)
 
-	# Read the input file
-	stories = Reader.parse(filename)
+	if compare_parse:
+		stories = list(stories)
 	user_stories = UserStorySet(nlp, systemname)
 
 	# Parse every user story (remove punctuation and mine)
-	miner = StoryMiner(user_stories.system)
-	for i, s in enumerate(stories):
-		try:
-			us = parse(s, i + 1, nlp, miner)
-			user_stories.set.append(us)
-		except ValueError as e:
-			user_stories.set.append(FailedUserStory(i + 1, s, str(e.args[0])))
+	miner = StoryMiner(user_stories.system, part_cache, role_cache)
+	miner.instrument = instrument
+	throughput = {}
+	def mine_stories(stories):
+		if workers:
+			results = mine_parallel(stories, nlp, user_stories.system, model, systemname, workers,
+				batch_size=batch_size, single_parse=single_parse, throughput=throughput, cache=cache, keep_docs=keep_docs,
+				instrument=instrument or None, miner=miner)
+		elif batch_size:
+			results = mine_batch(stories, nlp, miner, batch_size, single_parse)
+		else:
+			results = mine(stories, nlp, miner, single_parse)
+		return retain(results, keep_docs)
 
-	status("Done mining", timeit.default_timer() - start_)
+	profiler = None
+	if profile:
+		profiler = Profiler()
+		profiler.watch(miner)
+		mine_unprofiled = mine_stories
+		mine_stories = lambda stories: profiler.mine(stories, mine_unprofiled, profile_sample)
+
+	duplicates = None
+	if dedup:
+		# Mine user stories with the same normalized text once
+		duplicates = Duplicates()
+		mine_unique = mine_stories
+		mine_stories = lambda stories: dedupe(stories, mine_unique, duplicates, keep_docs)
+
+	changes = None
+	if previous:
+		# Only mine the user stories that changed since the earlier run
+		changes = ChangeSummary()
+		results = remine(stories, load_previous(previous, nlp.vocab), mine_stories, changes)
+	else:
+		results = mine_stories(stories)
+
+	docs = DocSidecar() if docbin else None
+
+	file = None
+	total = failed = 0
+	table = TableBuilder() if stats else None
+	columns = Writer().make_columnar("output", str(systemname), columnar_format, chunk_size) if columnar else None
+	factors = FactorMatrix(base) if matrix else None
+	owl = None
+	if ontology:
+		owl = OntologyWriter(Writer().make_stream("output", str(systemname), EXTENSIONS[ontology], flush_every), systemname, ontology)
+	if ndjson:
+		# Create and write output per user story, without keeping them in the set
+		w = Writer()
+		with w.make_stream("output", str(systemname), "ndjson", flush_every) as out:
+			for us in results:
+				with instrument.time('export', us.id), profiler.phase('export') if profiler else nullcontext():
+					line = us.toJSON(docs)
+				with instrument.time('write', us.id):
+					out.write(line)
+				total += 1
+				failed += type(us) is FailedUserStory
+				if table:
+					table.add(us)
+				if columns:
+					columns.add(us)
+				if factors:
+					factors.add(us)
+				if owl:
+					owl.add(us)
+		file = out.name
+		status("Done mining, written to file '{}'".format(file), timeit.default_timer() - start_)
+		if docs is not None:
+			write_sidecar(docs, file)
+	else:
+		user_stories.set.extend(results)
+		total = len(user_stories.set)
+		failed = sum(1 for us in user_stories.set if type(us) is FailedUserStory)
+		status("Done mining", timeit.default_timer() - start_)
+		if columns:
+			for us in user_stories.set:
+				columns.add(us)
+		if factors:
+			factors.update(user_stories.set)
+		if owl:
+			for us in user_stories.set:
+				owl.add(us)
+	times = [("NLP instantiate", nlp_time), ("Mining User Stories", timeit.default_timer() - start_)]
+	if columns:
+		columns.close()
+		print("Columnar output written to file '{}' ({} user stories in {} chunks)".format(columns.name, columns.rows, columns.chunks))
+	if owl:
+		owl.close()
+		print("Ontology written to file '{}' ({} classes, {} object properties, {} axioms)".format(owl.name, owl.classes, owl.properties, owl.axioms))
+	if throughput:
+		Printer.print_throughput(throughput)
+	if changes:
+		Printer.print_change_summary(changes)
+
+	if duplicates is not None and duplicates.stories:
+		print("Deduplicated: {} user stories, {} unique texts mined (dedup ratio {:.1%})".format(
+			duplicates.stories, duplicates.unique, duplicates.ratio()))
+
+	if part_cache or role_cache:
+		Printer.print_cache_info("Part cache", miner.part_cache.cache_info())
+		Printer.print_cache_info("Role cache", miner.role_cache.cache_info())
+
+	if cache:
+		cache.close()
+		print("Parse cache: {} hits, {} misses".format(cache.hits, cache.misses))
+
+	rss = peak_rss()
+	if rss:
+		print("Peak RSS: {:.0f} MB (keep docs: {})".format(rss, keep_docs))
+
+	if compare_parse:
+		Printer.print_parse_comparison(compare_single(stories, nlp, miner))
+
+	if stats:
+		start_ = timeit.default_timer()
+		if not ndjson:
+			table.extend(user_stories.set)
+		statistics = Statistics(table.table())
+		Printer.print_stats(statistics, verbose)
+		files = statistics.write(Writer(), "output", str(systemname))
+		times.append(("Generating statistics", timeit.default_timer() - start_))
+		print("Statistics written to {} files, such as '{}'".format(len(files), files[0]))
+
+	if factors:
+		start_ = timeit.default_timer()
+		terms = factors.threshold(threshold)
+		Printer.print_gen_settings(factors, base, threshold)
+		Printer.print_terms(factors.top(top), factors.shape(), top)
+		file_ = Writer().make_file("output", str(systemname) + "-terms", "csv", [["term", "weight"]] + terms)
+		times.append(("Generating factor matrix", timeit.default_timer() - start_))
+		print("{} terms with a weight of at least {} written to file '{}'".format(len(terms), threshold, file_))
+
+	if export and not ndjson:
+		ids = [us.id for us in user_stories.set]
 
-	if export:
 		## 3) Create output
 		start_ = timeit.default_timer()
-		output = str(user_stories.toJSON())
-		status("Output JSON created", timeit.default_timer() - start_)
+		# The sampled user stories are profiled before the export is timed
+		with profiler.export(user_stories.set) if profiler else nullcontext(), instrument.time_batch('export', ids):
+			output = str(user_stories.toJSON(docs))
+		times.append(("Creating output", timeit.default_timer() - start_))
+		status("Output JSON created", times[-1][1])
 
 		## 4) Write output files
 		start_ = timeit.default_timer()
 		w = Writer()
-		file = w.make_file("output", str(systemname), "json", output)
-		status("Written to file '{}', done".format(file), timeit.default_timer() - start_)
+		with instrument.time_batch('write', ids):
+			file = w.make_file("output", str(systemname), "json", output)
+		times.append(("Writing output", timeit.default_timer() - start_))
+		status("Written to file '{}', done".format(file), times[-1][1])
+		if docs is not None:
+			write_sidecar(docs, file)
+
+	if timings:
+		Printer.print_timings(instrument.report())
+		filename = report_name(file, systemname, "Timings", "timings.json") + ".timings.json"
+		instrument.write(filename)
+		print("Timings written to file '{}'".format(filename))
+
+	if profiler:
+		Printer.print_profile(profiler.report(), profiler.functions())
+		files = profiler.write(report_name(file, systemname, "Profile", "pstats"))
+		print("Profile written to files '{}' and '{}'".format(*files))
 
 	time = timeit.default_timer() - start
 	vprint("Time taken: {}s".format(time))
+	if verbose:
+		Printer.print_details(failed, total - failed, times)
 
 	# Return objects so that they can be used as input for other tools
 	return user_stories, time
 
+def main_remote(address, stories, systemname, export, model):
+	"""Mines user stories on a running mining server
 
-def parse(text, id, nlp, miner):
-	"""Create a new user story object and mines it to map all data in the user story text to a predefined model
-	
-	:param text: The user story text
-	:param id: The user story ID, which can later be used to identify the user story
-	:param nlp: Natural Language Processor (spaCy)
-	:param miner: instance of class Miner
-	:returns: A new user story object
+	:param address: Address of the server
+	:param stories: List of (ID, text) pairs
+	:returns: Tuple of the mined UserStorySet, of carried over user stories (see storyminer.incremental.load_set), and the time taken,
+		or None if the server cannot be used
 	"""
-	# Prepare for NLP 
-	no_punct = remove_punct(text)
-	no_double_space = ' '.join(no_punct.split())
+	from storyminer.client import Client, ServerError
+	from storyminer.incremental import load_set
+	from storyminer.io import Writer
+
+	start = timeit.default_timer()
+	try:
+		output = Client(address).mine(stories, systemname, model)
+	except (OSError, ServerError) as e:
+		vprint("Not using mining server at {} ({}), mining locally".format(address, e))
+		return None
+	status("Mined on server at {}".format(address), timeit.default_timer() - start)
+
+	if export:
+		start_ = timeit.default_timer()
+		w = Writer()
+		file = w.make_file("output", str(systemname), "json", output)
+		status("Written to file '{}', done".format(file), timeit.default_timer() - start_)
 
-	# Create user story object
-	user_story = UserStory(id, text.rstrip(), no_double_space)
-	user_story.doc = nlp(no_double_space)
+	time = timeit.default_timer() - start
+	vprint("Time taken: {}s".format(time))
+	return load_set(output), time
 
-	# Mine user story
-	miner.structure(user_story)
-	user_story.old_doc = user_story.doc
-	user_story.doc = nlp(user_story.sentence)
-	miner.mine(user_story, nlp)
-	return user_story
+def write_sidecar(docs, outputname):
+	start = timeit.default_timer()
+	sidecar = os.path.splitext(outputname)[0] + ".spacy"
+	docs.write(sidecar)
+	status("Docs written to file '{}'".format(sidecar), timeit.default_timer() - start)
+
+def report_name(outputname, systemname, kind, filetype):
+	"""Picks the name of a report, next to the output file or in the output directory if there is none
+
+	:param outputname: Name and location of the output file, or None
+	:param kind: Kind of report, used in the name if there is no output file
+	:param filetype: Extension of the report file
+	:returns: Name and location of the report, without extension
+	"""
+	if outputname:
+		return os.path.splitext(outputname)[0]
+	from storyminer.io import Writer
+	return Writer().make_name("output", str(systemname) + kind, filetype)[:-len(filetype) - 1]
 
 def status(name, time):
 	vprint("> {} (elapsed {:6.4f}s)".format(name, time))
@@ -110,13 +366,47 @@ This program has multiple functionalities:
 		epilog='''{*} Utrecht University.
 			M.J. Robeer, 2017''')
 
-	p.add_argument("filename",
-                    help="input file with user stories", metavar="INPUT FILE",
+	p.add_argument("filename", nargs="?",
+                    help="input file with user stories, or - for stdin", metavar="INPUT FILE",
                     type=lambda x: is_valid_file(p, x))
 	p.add_argument('--version', action='version', version='Story Miner v0.3 BETA by M.J. Robeer')
 	p.add_argument("-n", "--name", dest="system_name", help="your system name, as used in ontology and output file(s) generation", required=False)
 	p.add_argument("-e", "--export", action="store_true", help="export to json", required=False)
+	p.add_argument("--ndjson", action="store_true", help="write each user story to a JSON lines file as soon as it is mined", required=False)
+	p.add_argument("--flush-every", dest="flush_every", type=int, help="flush the JSON lines file every N user stories", required=False)
+	p.add_argument("--docbin", action="store_true", help="write docs to a binary DocBin file next to the output instead of inlining them", required=False)
+	p.add_argument("--cache", dest="cache_dir", help="keep parsed docs in a persistent cache in this directory", metavar="DIR", required=False)
+	p.add_argument("--cache-size", dest="cache_size", type=int, default=DEFAULT_MAX_SIZE // 2**20, help="maximum size of the parse cache in MB", required=False)
+	p.add_argument("--clear-cache", dest="clear_cache", action="store_true", help="empty the parse cache before mining", required=False)
+	p.add_argument("--previous", help="output file of an earlier run, only new and changed user stories are mined", metavar="FILE",
+		type=lambda x: is_valid_file(p, x), required=False)
+	p.add_argument("-m", "--model", default=DEFAULT_MODEL, help="spaCy model: sm, md, lg or a model package name (default: %(default)s)", required=False)
+	p.add_argument("--serve", nargs="?", const=DEFAULT_ADDRESS, help="load the model once and serve mining requests on ADDRESS (host:port or a Unix socket path, default: %(const)s)",
+		metavar="ADDRESS", required=False)
+	p.add_argument("--server", help="mine on the server at ADDRESS if it is running (default: ${})".format(SERVER_ENV), metavar="ADDRESS", required=False)
+	p.add_argument("--keep-docs", dest="keep_docs", choices=KEEP_DOCS, default="all",
+		help="docs to keep after a user story is mined: all, parts (role, means and ends) or none (default: %(default)s)", required=False)
+	p.add_argument("--dedup", action="store_true", help="mine user stories with the same normalized text once, and copy the result to the others (keeps a compact copy of every unique user story)", required=False)
+	p.add_argument("--part-cache", dest="part_cache", type=int, default=DEFAULT_PART_CACHE, help="number of parsed role, means and ends texts to keep in memory (default: %(default)s)", metavar="N", required=False)
+	p.add_argument("--role-cache", dest="role_cache", type=int, default=DEFAULT_ROLE_CACHE, help="number of functional roles to keep in memory (default: %(default)s)", metavar="N", required=False)
+	p.add_argument("--stats", action="store_true", help="print statistics of the mined user stories and write them to CSV files", required=False)
+	p.add_argument("--columnar", action="store_true", help="write the mined fields of every user story to a flat Parquet or CSV file as it is mined", required=False)
+	p.add_argument("--columnar-format", dest="columnar_format", choices=FORMATS, help="format of the columnar file (default: parquet if pyarrow is installed, otherwise csv)", required=False)
+	p.add_argument("--chunk-size", dest="chunk_size", type=int, default=DEFAULT_CHUNK_SIZE, help="user stories per chunk of the columnar file (default: %(default)s)", metavar="N", required=False)
+	p.add_argument("--matrix", action="store_true", help="build the factor matrix of the terms of the mined user stories and write the terms above the threshold to a CSV file", required=False)
+	p.add_argument("--base", type=float, default=DEFAULT_BASE, help="base weight of the factor matrix (default: %(default)s)", required=False)
+	p.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="lowest summed weight of the terms to write (default: %(default)s)", required=False)
+	p.add_argument("--top", type=int, default=DEFAULT_TOP, help="number of terms with the highest weight to print (default: %(default)s)", metavar="K", required=False)
+	p.add_argument("--ontology", nargs="?", const="turtle", choices=SYNTAXES, help="write an OWL ontology of the roles, objects and verbs of the mined user stories as they are mined, in Turtle or Manchester syntax (default: %(const)s)", required=False)
+	p.add_argument("--timings", action="store_true", help="time every stage per user story and write a report next to the output", required=False)
+	p.add_argument("--profile", action="store_true", help="profile mining with cProfile and tracemalloc, and write the statistics next to the output", required=False)
+	p.add_argument("--profile-sample", dest="profile_sample", type=int, default=1, help="profile one in N user stories (default: %(default)s)", metavar="N", required=False)
 	p.add_argument("-v", "--verbose", action="store_true", help="print outputs", required=False)
+	p.add_argument("-b", "--batch-size", dest="batch_size", type=int, help="parse user stories with nlp.pipe in batches of this size", required=False)
+	p.add_argument("-s", "--single-parse", dest="single_parse", action="store_true", help="parse the parts of every user story at once instead of once per part", required=False)
+	p.add_argument("-w", "--workers", type=int, help="mine in this many worker processes", required=False)
+	p.add_argument("--line-ids", dest="line_ids", action="store_true", help="use input line numbers as user story IDs", required=False)
+	p.add_argument("--compare-parse", dest="compare_parse", action="store_true", help="report how often single-parse mining differs from the default", required=False)
 
 	if (len(args) < 1):
 		args = p.parse_args()
@@ -129,12 +419,33 @@ This program has multiple functionalities:
 	global verbose
 	verbose = args.verbose
 
-	return main(args.filename, args.system_name, args.export)
+	if args.serve:
+		from storyminer.pipeline import DEFAULT_BATCH_SIZE
+		from storyminer.server import serve
+		return serve(args.serve, args.model, batch_size=args.batch_size or DEFAULT_BATCH_SIZE, verbose=args.verbose)
+	if not args.filename:
+		p.error("the following arguments are required: INPUT FILE")
+	if args.profile and args.workers:
+		p.error("--profile cannot be used with --workers, as worker processes are not profiled")
+	for flag in ['matrix', 'ontology']:
+		if getattr(args, flag) and (args.keep_docs != 'all' or args.previous or args.dedup):
+			p.error("--{} needs --keep-docs all and cannot be used with --previous or --dedup, as its terms are lemmatized from the parsed tokens".format(flag))
+	if args.columnar_format == 'parquet' and not has_pyarrow():
+		p.error("--columnar-format parquet needs pyarrow, which is not installed")
+
+	return main(args.filename, args.system_name, args.export, batch_size=args.batch_size, single_parse=args.single_parse,
+		compare_parse=args.compare_parse, workers=args.workers, line_ids=args.line_ids, ndjson=args.ndjson, flush_every=args.flush_every,
+		docbin=args.docbin, cache_dir=args.cache_dir, cache_size=args.cache_size * 2**20, clear_cache=args.clear_cache,
+		previous=args.previous, model=args.model, server=args.server,
+		keep_docs=args.keep_docs, timings=args.timings, profile=args.profile, profile_sample=args.profile_sample,
+		dedup=args.dedup, part_cache=args.part_cache, role_cache=args.role_cache, stats=args.stats,
+		columnar=args.columnar, columnar_format=args.columnar_format, chunk_size=args.chunk_size, matrix=args.matrix,
+		base=args.base, threshold=args.threshold, top=args.top, ontology=args.ontology)
 
 def is_valid_file(parser, arg):
-    if not os.path.exists(arg):
+    if arg != '-' and not os.path.exists(arg):
         parser.error("Could not find file " + str(arg) + "!")
-    return open(arg, 'r')
+    return arg
 
 if __name__ == "__main__":
 	program()
\ No newline at end of file
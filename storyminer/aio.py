@@ -0,0 +1,99 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from storyminer.pipeline import mine, mine_batch
+
+DEFAULT_READ_AHEAD = 2
+DEFAULT_CHUNK_SIZE = 32
+# Time a partial chunk waits for more user stories before it is mined, in seconds
+DEFAULT_MAX_WAIT = 0.05
+
+# Marks the end of the input and of the chunks
+_END = object()
+
+async def mine_async(stories, nlp, miner, read_ahead=DEFAULT_READ_AHEAD, chunk_size=DEFAULT_CHUNK_SIZE, max_wait=DEFAULT_MAX_WAIT,
+		batch_size=None, single_parse=False, executor=None):
+	"""Mines user stories from an async iterable, without blocking the event loop
+
+	User stories are mined in chunks in an executor. At most read_ahead chunks are submitted ahead of the
+	consumer; after that, reading the input waits until the consumer takes the results of a chunk, so a slow
+	consumer does not cause unbounded buffering. The model is used by one executor thread at a time, so chunks
+	are mined one after the other: read_ahead is how far mining runs ahead of the consumer, not parallelism.
+
+	:param stories: Async iterable of texts, numbered from 1, or of (ID, text) pairs
+	:param nlp: Natural Language Processor (spaCy)
+	:param miner: instance of class Miner
+	:param read_ahead: Maximum number of chunks that are submitted to be mined, or mined, and not yet consumed
+	:param chunk_size: Maximum number of user stories per chunk
+	:param max_wait: Time a partial chunk waits for more user stories, in seconds
+	:param batch_size: If set, parse with nlp.pipe in batches of this size, see mine_batch
+	:param single_parse: Parse the parts of each user story at once, see parse_single
+	:param executor: Executor to mine in, by default a single thread that is shut down afterwards
+	:returns: Async generator of UserStory and FailedUserStory objects, in input order
+	"""
+	loop = asyncio.get_running_loop()
+	own_executor = executor is None
+	if own_executor:
+		executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="storyminer")
+	lock = threading.Lock()
+
+	def mine_chunk(chunk):
+		with lock:
+			if batch_size:
+				return list(mine_batch(chunk, nlp, miner, batch_size, single_parse))
+			return list(mine(chunk, nlp, miner, single_parse))
+
+	incoming = asyncio.Queue(maxsize=chunk_size)
+	chunks = asyncio.Queue()
+	# A slot is taken before a chunk is submitted, and given back when the consumer takes its results
+	slots = asyncio.Semaphore(read_ahead)
+	errors = []
+
+	async def read():
+		try:
+			number = 0
+			async for story in stories:
+				number += 1
+				await incoming.put((number, story) if isinstance(story, str) else tuple(story))
+		except Exception as e:
+			errors.append(e)
+		await incoming.put(_END)
+
+	async def submit():
+		try:
+			chunk = []
+			while True:
+				try:
+					story = await asyncio.wait_for(incoming.get(), max_wait if chunk else None)
+				except asyncio.TimeoutError:
+					story = None
+				if story is not None and story is not _END:
+					chunk.append(story)
+				if chunk and (story is None or story is _END or len(chunk) >= chunk_size):
+					await slots.acquire()
+					chunks.put_nowait(loop.run_in_executor(executor, mine_chunk, chunk))
+					chunk = []
+				if story is _END:
+					break
+		except Exception as e:
+			errors.append(e)
+		chunks.put_nowait(_END)
+
+	tasks = [loop.create_task(read()), loop.create_task(submit())]
+	try:
+		while True:
+			results = await chunks.get()
+			if results is _END:
+				break
+			results = await results
+			slots.release()
+			for us in results:
+				yield us
+		if errors:
+			raise errors[0]
+	finally:
+		for task in tasks:
+			task.cancel()
+		if own_executor:
+			executor.shutdown(wait=False)
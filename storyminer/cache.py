@@ -0,0 +1,218 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple, OrderedDict
+
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+# Number of part parses and of functional roles that StoryMiner keeps in memory
+DEFAULT_PART_CACHE = 1024
+DEFAULT_ROLE_CACHE = 256
+CACHE_FILE = "parses.sqlite"
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+class LRUCache(object):
+	"""In-memory cache of at most maxsize entries, that evicts the least recently used entry when it is full"""
+	def __init__(self, maxsize):
+		"""
+		:param maxsize: Maximum number of entries, 0 to cache nothing
+		"""
+		self.maxsize = maxsize
+		self.data = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+	def get(self, key):
+		"""
+		:returns: The value of key, or None if it is not in the cache
+		"""
+		value = self.data.get(key)
+		if value is None:
+			self.misses += 1
+			return None
+		self.data.move_to_end(key)
+		self.hits += 1
+		return value
+
+	def put(self, key, value):
+		if self.maxsize <= 0:
+			return
+		self.data[key] = value
+		self.data.move_to_end(key)
+		if len(self.data) > self.maxsize:
+			self.data.popitem(last=False)
+
+	def cache_info(self):
+		"""
+		:returns: CacheInfo, as functools.lru_cache gives
+		"""
+		return CacheInfo(self.hits, self.misses, self.maxsize, len(self.data))
+
+	def clear(self):
+		self.data.clear()
+		self.hits = self.misses = 0
+
+class ParseCache(object):
+	"""Persistent cache of parsed docs, stored in SQLite
+
+	Docs are keyed by a hash of the exact text that was parsed and the name and version of the model.
+	When the cache grows beyond its maximum size, the least recently used docs are evicted.
+	New docs are written at once, so that several processes can share the same cache. The times that docs were
+	last used are kept in memory, and written in one transaction every CHECK_EVERY changes and when the cache is closed.
+	"""
+	CHECK_EVERY = 1000
+	EXCLUDE = ['tensor', 'user_data']
+
+	def __init__(self, directory, nlp, max_size=DEFAULT_MAX_SIZE):
+		"""Opens or creates the cache
+
+		:param directory: Directory of the cache
+		:param nlp: Natural Language Processor (spaCy) of which the parses are cached
+		:param max_size: Maximum total size of the cached docs in bytes
+		"""
+		if not os.path.exists(directory):
+			os.makedirs(directory)
+		self.directory = directory
+		self.db = sqlite3.connect(os.path.join(directory, CACHE_FILE), timeout=60, isolation_level=None, check_same_thread=False)
+		self.db.execute("PRAGMA journal_mode=WAL")
+		self.db.execute("PRAGMA synchronous=NORMAL")
+		self.db.execute("CREATE TABLE IF NOT EXISTS docs (key TEXT PRIMARY KEY, data BLOB, size INTEGER, used REAL)")
+		self.db.execute("CREATE INDEX IF NOT EXISTS docs_used ON docs (used)")
+		self.lock = threading.Lock()
+
+		import spacy
+		self.model = "{}_{}-{}/spacy-{}".format(nlp.meta.get('lang'), nlp.meta.get('name'), nlp.meta.get('version'), spacy.__version__)
+		self.max_size = max_size
+		self.changes = 0
+		# Time every doc that was read was last used, by key, that is not written yet
+		self.used = {}
+		self.hits = 0
+		self.misses = 0
+
+	def key(self, text):
+		return hashlib.sha256((self.model + "\0" + text).encode('utf-8')).hexdigest()
+
+	def get(self, text):
+		"""Gets the serialized doc of a text
+
+		:param text: The exact text that was parsed
+		:returns: Bytes of the doc, or None if the text is not in the cache
+		"""
+		key = self.key(text)
+		with self.lock:
+			row = self.db.execute("SELECT data FROM docs WHERE key = ?", (key,)).fetchone()
+			if row is None:
+				self.misses += 1
+				return None
+			self.hits += 1
+			self.used[key] = time.time()
+			self._changed()
+		return row[0]
+
+	def put(self, text, doc):
+		"""Stores the doc of a text
+
+		:param text: The exact text that was parsed
+		:param doc: The parsed doc
+		"""
+		data = doc.to_bytes(exclude=ParseCache.EXCLUDE)
+		with self.lock:
+			self.db.execute("INSERT OR IGNORE INTO docs VALUES (?, ?, ?, ?)", (self.key(text), data, len(data), time.time()))
+			self._changed()
+
+	def _changed(self):
+		self.changes += 1
+		if self.changes >= ParseCache.CHECK_EVERY:
+			self._evict()
+
+	def _flush(self):
+		# Write the times that docs were last used, in one transaction
+		if not self.used:
+			return
+		self.db.execute("BEGIN IMMEDIATE")
+		self.db.executemany("UPDATE docs SET used = ? WHERE key = ?", ((used, key) for key, used in self.used.items()))
+		self.db.execute("COMMIT")
+		self.used = {}
+
+	def _evict(self):
+		# Remove least recently used docs until the cache is at 90% of its maximum size
+		self.changes = 0
+		self._flush()
+		size = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM docs").fetchone()[0]
+		if size <= self.max_size:
+			return
+		target = self.max_size * 0.9
+		self.db.execute("BEGIN IMMEDIATE")
+		for key, doc_size in self.db.execute("SELECT key, size FROM docs ORDER BY used").fetchall():
+			if size <= target:
+				break
+			self.db.execute("DELETE FROM docs WHERE key = ?", (key,))
+			size -= doc_size
+		self.db.execute("COMMIT")
+
+	def flush(self):
+		"""Writes the times that docs were last used, which are otherwise written every CHECK_EVERY changes"""
+		with self.lock:
+			self._flush()
+
+	def evict(self):
+		"""Evicts the least recently used docs if the cache is too large"""
+		with self.lock:
+			self._evict()
+
+	def clear(self):
+		"""Removes all cached docs"""
+		with self.lock:
+			self.used = {}
+			self.db.execute("DELETE FROM docs")
+			self.db.execute("VACUUM")
+
+	def close(self):
+		self.evict()
+		self.db.close()
+
+class CachedNLP(object):
+	"""Wraps a Natural Language Processor (spaCy), so that cached texts are not parsed again
+
+	Everything else is passed on to the wrapped Natural Language Processor.
+	"""
+	def __init__(self, nlp, cache):
+		self.nlp = nlp
+		self.cache = cache
+
+	def __call__(self, text):
+		from spacy.tokens import Doc
+		data = self.cache.get(text)
+		if data is not None:
+			return Doc(self.nlp.vocab).from_bytes(data)
+		doc = self.nlp(text)
+		self.cache.put(text, doc)
+		return doc
+
+	def pipe(self, texts, batch_size=1000, **kwargs):
+		"""Parses the texts that are not in the cache with nlp.pipe
+
+		:param texts: Iterable of texts
+		:param batch_size: Number of texts per nlp.pipe batch
+		:returns: Generator of docs, in the order of texts
+		"""
+		from spacy.tokens import Doc
+		texts = list(texts)
+		docs = []
+		missing = []
+		for i, text in enumerate(texts):
+			data = self.cache.get(text)
+			if data is None:
+				missing.append(i)
+				docs.append(None)
+			else:
+				docs.append(Doc(self.nlp.vocab).from_bytes(data))
+		for i, doc in zip(missing, self.nlp.pipe((texts[i] for i in missing), batch_size=batch_size, **kwargs)):
+			self.cache.put(texts[i], doc)
+			docs[i] = doc
+		return iter(docs)
+
+	def __getattr__(self, name):
+		return getattr(self.nlp, name)
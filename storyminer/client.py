@@ -0,0 +1,100 @@
+import http.client
+import json
+import os
+import socket
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+# Environment variable with the address of a running mining server
+SERVER_ENV = "STORYMINER_SERVER"
+
+class ServerError(Exception):
+	pass
+
+def parse_address(address):
+	"""Parses the address of a mining server
+
+	:param address: host:port, http://host:port, a Unix socket path, or unix:PATH
+	:returns: Tuple of the socket family and its address
+	"""
+	if address.startswith("unix:"):
+		return socket.AF_UNIX, address[len("unix:"):]
+	if address.startswith(("/", "./", "../")):
+		return socket.AF_UNIX, address
+	if address.startswith("http://"):
+		address = address[len("http://"):]
+	host, _, port = address.rstrip("/").rpartition(":")
+	if not host or not port.isdigit():
+		raise ValueError("Invalid server address '{}', expected host:port or a Unix socket path".format(address))
+	return socket.AF_INET, (host, int(port))
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+	"""HTTP connection over a Unix socket"""
+	def __init__(self, path, timeout=None):
+		super().__init__("localhost", timeout=timeout)
+		self.path = path
+
+	def connect(self):
+		self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		if self.timeout is not None:
+			self.sock.settimeout(self.timeout)
+		self.sock.connect(self.path)
+
+class Client(object):
+	"""Thin client of a mining server, see storyminer.server"""
+	def __init__(self, address=DEFAULT_ADDRESS, timeout=None):
+		"""
+		:param address: Address of the server, see parse_address
+		:param timeout: Socket timeout in seconds
+		"""
+		self.family, self.address = parse_address(address)
+		self.timeout = timeout
+
+	def connection(self):
+		if self.family == socket.AF_UNIX:
+			return UnixHTTPConnection(self.address, self.timeout)
+		return http.client.HTTPConnection(*self.address, timeout=self.timeout)
+
+	def request(self, method, path, body=None):
+		conn = self.connection()
+		try:
+			conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+			response = conn.getresponse()
+			data = response.read().decode('utf-8')
+		finally:
+			conn.close()
+		if response.status != 200:
+			try:
+				message = json.loads(data)['error']
+			except (ValueError, KeyError):
+				message = data
+			raise ServerError("Server responded {}: {}".format(response.status, message))
+		return data
+
+	def health(self):
+		"""Gets the model and status of the server
+
+		:returns: Dictionary
+		"""
+		return json.loads(self.request("GET", "/health"))
+
+	def mine(self, stories, systemname="System", model=None):
+		"""Mines user stories on the server
+
+		:param stories: Iterable of texts or (ID, text) pairs
+		:param systemname: System name, as passed to UserStorySet
+		:param model: If set, the server refuses the request unless it runs this model
+		:returns: JSON text, as produced by UserStorySet.toJSON
+		"""
+		stories = [{'id': s[0], 'text': s[1]} if isinstance(s, (tuple, list)) else s for s in stories]
+		body = {'stories': stories, 'system': systemname}
+		if model:
+			body['model'] = model
+		return self.request("POST", "/mine", json.dumps(body, ensure_ascii=False).encode('utf-8'))
+
+def server_address(address=None):
+	"""Gets the address of the mining server to use, if any
+
+	:param address: Address given on the command line
+	:returns: The address, the one in the STORYMINER_SERVER environment variable, or None
+	"""
+	return address or os.environ.get(SERVER_ENV) or None
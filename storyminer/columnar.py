@@ -0,0 +1,150 @@
+import csv
+import importlib.util
+
+from storyminer.userstory import FailedUserStory
+
+# Columns of the flat export, and the attribute path of each in a mined user story. Ends columns are empty if
+# a user story has no ends, and all mined columns are empty if it failed.
+COLUMNS = [
+	('role_indicator', 'role.indicator'),
+	('role', 'role.functional_role.main'),
+	('role_compound', 'role.functional_role.compound'),
+	('means_indicator', 'means.indicator'),
+	('means_verb', 'means.main_verb.main'),
+	('means_verb_phrase', 'means.main_verb.phrase'),
+	('verb_type', 'means.main_verb.type'),
+	('means_object', 'means.main_object.main'),
+	('means_object_compound', 'means.main_object.compound'),
+	('ends_indicator', 'ends.indicator'),
+	('ends_verb', 'ends.main_verb.main'),
+	('ends_verb_phrase', 'ends.main_verb.phrase'),
+	('ends_verb_type', 'ends.main_verb.type'),
+	('ends_object', 'ends.main_object.main'),
+	('ends_object_compound', 'ends.main_object.compound'),
+]
+NAMES = ['id'] + [name for name, _ in COLUMNS] + ['has_ends', 'error']
+FORMATS = ['parquet', 'csv']
+# Number of user stories per row group, and per write of the CSV file
+DEFAULT_CHUNK_SIZE = 10000
+
+def row(story):
+	"""Flattens a mined user story to the fields of the columnar export
+
+	:param story: UserStory, FailedUserStory, compact or carried over user story
+	:returns: Dictionary with a value for every name in NAMES, of which the mined fields are texts or None
+	"""
+	failed = type(story) is FailedUserStory or get_attr(story, 'error') is not None
+	has_ends = not failed and bool(get_attr(story, 'has_ends'))
+	r = {'id': story.id}
+	for name, path in COLUMNS:
+		if failed or (name.startswith('ends') and not has_ends):
+			r[name] = None
+		else:
+			r[name] = get_text(story, path)
+	r['has_ends'] = has_ends
+	r['error'] = get_attr(story, 'error') if failed else None
+	return r
+
+def has_pyarrow():
+	return importlib.util.find_spec('pyarrow') is not None
+
+def default_format():
+	"""
+	:returns: 'parquet' if pyarrow is installed, otherwise 'csv'
+	"""
+	return 'parquet' if has_pyarrow() else 'csv'
+
+class ColumnarWriter(object):
+	"""Writes mined user stories as a flat table, one row per user story, as they are mined
+
+	Rows are kept until chunk_size of them are added, and are then written as a row group (Parquet) or as
+	lines (CSV), so that only one chunk is in memory at a time.
+	"""
+	def __init__(self, outputname, format=None, chunk_size=None):
+		"""
+		:param outputname: Name and location of the output file
+		:param format: 'parquet' or 'csv', by default Parquet if pyarrow is installed
+		:param chunk_size: Number of user stories per chunk
+		"""
+		self.name = outputname
+		self.format = format or default_format()
+		self.chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+		self.columns = {name: [] for name in NAMES}
+		self.rows = 0
+		self.chunks = 0
+		if self.format == 'parquet':
+			import pyarrow.parquet as pq
+			self.file = pq.ParquetWriter(outputname, _schema())
+		else:
+			self.file = open(outputname, 'w', newline='')
+			self.csv = csv.writer(self.file, delimiter=",", quotechar='"', quoting=csv.QUOTE_NONNUMERIC)
+			self.csv.writerow(NAMES)
+
+	def add(self, story):
+		"""Adds a mined user story, and writes a chunk if it is full
+
+		:param story: UserStory, FailedUserStory, compact or carried over user story
+		"""
+		for name, value in row(story).items():
+			self.columns[name].append(value)
+		self.rows += 1
+		if len(self.columns['id']) >= self.chunk_size:
+			self.flush()
+
+	def flush(self):
+		"""Writes the rows added since the last chunk"""
+		columns = self.columns
+		if not columns['id']:
+			return
+		if self.format == 'parquet':
+			import pyarrow as pa
+			self.file.write_table(pa.Table.from_pydict(columns, schema=self.file.schema))
+		else:
+			self.csv.writerows(zip(*[columns[name] for name in NAMES]))
+		self.chunks += 1
+		self.columns = {name: [] for name in NAMES}
+
+	def close(self):
+		self.flush()
+		self.file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+def _schema():
+	import pyarrow as pa
+	fields = [pa.field(name, pa.string()) for name in NAMES]
+	# IDs are the numbers of the user stories in the input, see Reader.stream
+	fields[0] = pa.field('id', pa.int64())
+	fields[NAMES.index('has_ends')] = pa.field('has_ends', pa.bool_())
+	return pa.schema(fields)
+
+def get_attr(o, name):
+	"""Gets an attribute of a mined user story or part, or a key of a carried over one, or None"""
+	if type(o) is dict:
+		return o.get(name)
+	return getattr(o, name, None)
+
+def get_path(o, path):
+	"""Gets a dotted attribute path, such as 'means.main_verb.main', with get_attr"""
+	for name in path.split('.'):
+		o = get_attr(o, name)
+		if o is None:
+			return None
+	return o
+
+def get_text(o, path):
+	"""Gets the text of a dotted attribute path, such as 'means.main_verb.main', or None if it has none"""
+	return _text(get_path(o, path))
+
+def _text(o):
+	# Tokens and spans of mined user stories, and their texts in compact and carried over user stories
+	if o is None or type(o) is str:
+		return o or None
+	if type(o) is list or type(o) is tuple:
+		# Compounds are lists of tokens, tuples in compact user stories; empty lists are parts that were not found
+		return " ".join(t for t in (_text(x) for x in o) if t) or None
+	return o.text
@@ -0,0 +1,184 @@
+import base64
+import json
+import sys
+
+from storyminer.userstory import UserStory, UserStoryPart, WithMain
+
+# A mined user story holds its docs and lists of tokens and spans, and gets attributes added as it is mined.
+# The compact classes below keep only what is exported: token indices and texts, span offsets and texts, and
+# optionally the doc bytes. They export to the same JSON as the user story they were made of.
+
+class Tok(object):
+	__slots__ = ('i', 'text')
+
+	def __init__(self, i, text):
+		self.i = i
+		self.text = text
+
+class Phrase(object):
+	__slots__ = ('start', 'end', 'text')
+
+	def __init__(self, start, end, text):
+		self.start = start
+		self.end = end
+		self.text = text
+
+class DocRef(object):
+	__slots__ = ('key',)
+
+	def __init__(self, key):
+		self.key = key
+
+class Compact(object):
+	"""Base of the compact classes, of which keys holds the names of the set attributes in their original order"""
+	__slots__ = ('keys', 'extra')
+
+	def __getattr__(self, name):
+		# Attributes the class has no slot for are kept in extra
+		try:
+			return object.__getattribute__(self, 'extra')[name]
+		except (AttributeError, KeyError):
+			raise AttributeError(name)
+
+	def set(self, name, value):
+		if name in type(self).__slots__:
+			object.__setattr__(self, name, value)
+		else:
+			try:
+				self.extra[name] = value
+			except AttributeError:
+				self.extra = {name: value}
+
+	def to_dict(self, story, docs, loaded):
+		return {k: _export(getattr(self, k), story, docs, loaded) for k in self.keys}
+
+class CompactMain(Compact):
+	__slots__ = ('main', 'phrase', 'compound', 'type')
+
+class CompactPart(Compact):
+	__slots__ = ('doc', 't', 'simplified', 'indicator', 'indicator_t', 'indicator_i', 'functional_role', 'main_verb',
+		'main_object', 'subject', 'free_form', 'verbs', 'phrasal_verbs', 'nouns', 'proper_nouns', 'noun_phrases',
+		'compounds', 'text', 'doc_t')
+
+class CompactStory(Compact):
+	__slots__ = ('id', 'text', 'sentence', 'iloc', 'role', 'means', 'ends', 'has_ends', 'doc', 'old_doc', 'docs', 'vocab')
+
+	def export(self):
+		return
+
+	def to_dict(self, docs=None):
+		"""Exports the user story as UserStory.toJSON does, before JSON encoding
+
+		:param docs: Optional DocSidecar to put docs in, instead of inlining them
+		:returns: Dictionary
+		"""
+		return Compact.to_dict(self, self, docs, {})
+
+	def toJSON(self, docs=None):
+		"""Exports the user story as a single line of JSON
+
+		:param docs: Optional DocSidecar to put docs in, instead of inlining them
+		"""
+		line = json.dumps(self.to_dict(docs=docs), ensure_ascii=False)
+		if docs is not None:
+			docs.forget()
+		return line
+
+	def txtnr(self):
+		return "US" + str(self.id)
+
+	def is_func_role(self, token):
+		return token.i in self.iloc
+
+# Shared key tuples, so that stories with the same attributes do not each keep their own
+_KEYS = {}
+
+def compact(story, keep_docs=True):
+	"""Converts a mined user story to its compact form
+
+	:param story: A mined UserStory; other objects, such as a FailedUserStory, are returned as they are
+	:param keep_docs: Keep the bytes of the docs, so that they are exported too; if not, docs are exported as null.
+		With 'parts', only the docs of the role, means and ends are kept.
+	:returns: CompactStory
+	"""
+	if type(story) is not UserStory:
+		return story
+	# Sets the texts of the parts, which are taken from their docs
+	story.export()
+
+	dropped = [getattr(story, 'doc', None), getattr(story, 'old_doc', None)] if keep_docs == 'parts' else []
+	encoder = Encoder(keep_docs, dropped)
+	c = encoder.compact(story, CompactStory)
+	c.docs = tuple(encoder.docs)
+	c.vocab = story.doc.vocab if keep_docs and hasattr(story, 'doc') else None
+	return c
+
+class Encoder(object):
+	"""Converts the attributes of one user story, and keeps its docs"""
+	def __init__(self, keep_docs, dropped=()):
+		from spacy.tokens import Doc, Token, Span
+		self.Doc, self.Token, self.Span = Doc, Token, Span
+		self.keep_docs = keep_docs
+		self.dropped = set(id(doc) for doc in dropped)
+		self.docs = []
+		self.keys = {}
+
+	def compact(self, o, cls):
+		c = cls.__new__(cls)
+		names = tuple(o.__dict__)
+		c.keys = _KEYS.setdefault(names, names)
+		for name, value in o.__dict__.items():
+			c.set(name, self.encode(value))
+		return c
+
+	def encode(self, value):
+		t = type(value)
+		if t is self.Token:
+			return Tok(value.i, sys.intern(value.text))
+		elif t is self.Span:
+			return Phrase(value.start, value.end, value.text)
+		elif t is self.Doc:
+			# Every doc is stored once, however often it is referred to
+			if id(value) not in self.keys:
+				self.keys[id(value)] = len(self.docs)
+				keep = self.keep_docs and id(value) not in self.dropped
+				self.docs.append(value.to_bytes() if keep else None)
+			return _docref(self.keys[id(value)])
+		elif t is list or t is tuple:
+			return tuple(self.encode(x) for x in value)
+		elif t is str:
+			return sys.intern(value) if len(value) < 32 else value
+		elif t is WithMain:
+			return self.compact(value, CompactMain)
+		elif isinstance(value, UserStoryPart):
+			return self.compact(value, CompactPart)
+		return value
+
+# References to the first docs of a story, which are the same for every story
+_DOC_REFS = []
+
+def _docref(key):
+	while len(_DOC_REFS) <= key:
+		_DOC_REFS.append(DocRef(len(_DOC_REFS)))
+	return _DOC_REFS[key]
+
+def _export(value, story, docs, loaded):
+	t = type(value)
+	if t is Tok or t is Phrase:
+		return value.text
+	elif t is DocRef:
+		data = story.docs[value.key]
+		if data is None:
+			return None
+		if docs is not None:
+			# A DocSidecar adds a doc once as long as the same object is added, so each doc is loaded once
+			if value.key not in loaded:
+				from spacy.tokens import Doc
+				loaded[value.key] = Doc(story.vocab).from_bytes(data)
+			return docs.add(loaded[value.key])
+		return base64.encodebytes(data).decode('ascii')
+	elif t is tuple:
+		return [_export(x, story, docs, loaded) for x in value]
+	elif isinstance(value, Compact):
+		return value.to_dict(story, docs, loaded)
+	return value
@@ -0,0 +1,75 @@
+import json
+
+# Token attributes the miner reads, which are stored in the sidecar
+DOC_ATTRS = ["ORTH", "SPACY", "TAG", "POS", "LEMMA", "HEAD", "DEP", "ENT_IOB", "ENT_TYPE"]
+
+class DocSidecar(object):
+	"""Collects the docs of exported user stories in a single DocBin
+
+	The exported JSON holds the index of a doc in the DocBin instead of the doc itself.
+	"""
+	def __init__(self):
+		from spacy.tokens import DocBin
+		self.docbin = DocBin(attrs=DOC_ATTRS, store_user_data=False)
+		self.seen = {}
+
+	def add(self, doc):
+		"""Adds a doc, unless the same doc was added since the last call to forget()
+
+		:param doc: A spaCy doc
+		:returns: Index of the doc in the DocBin
+		"""
+		if id(doc) not in self.seen:
+			self.docbin.add(doc)
+			# Keep the doc, so that its id is not reused by another doc
+			self.seen[id(doc)] = (doc, len(self.docbin) - 1)
+		return self.seen[id(doc)][1]
+
+	def forget(self):
+		"""Releases the docs added so far, after their user story has been exported"""
+		self.seen = {}
+
+	def write(self, outputname):
+		"""Writes the DocBin to a file
+
+		:param outputname: Name and location of the output file
+		"""
+		with open(outputname, 'wb') as f:
+			f.write(self.docbin.to_bytes())
+
+class DocStore(object):
+	"""Lazily loads the docs of a DocBin sidecar, without parsing the texts again"""
+	def __init__(self, path, vocab):
+		self.path = path
+		self.vocab = vocab
+		self.docs = []
+		self.pending = None
+
+	def __getitem__(self, i):
+		"""Gets a doc by its index, loading docs up to and including that index
+
+		:param i: Index of the doc, as found in the exported JSON
+		:returns: The spaCy doc
+		"""
+		if self.pending is None:
+			from spacy.tokens import DocBin
+			with open(self.path, 'rb') as f:
+				self.pending = DocBin().from_bytes(f.read()).get_docs(self.vocab)
+		while len(self.docs) <= i:
+			self.docs.append(next(self.pending))
+		return self.docs[i]
+
+def load(path, sidecar, vocab):
+	"""Loads exported user stories along with the DocBin sidecar of their docs
+
+	:param path: Name and location of a JSON or JSON lines output file
+	:param sidecar: Name and location of the DocBin sidecar
+	:param vocab: Vocab to load the docs with
+	:returns: Tuple of a list of exported user stories and the DocStore of their docs
+	"""
+	with open(path) as f:
+		if path.endswith(".ndjson"):
+			stories = [json.loads(line) for line in f if line.strip()]
+		else:
+			stories = json.load(f)['set']
+	return stories, DocStore(sidecar, vocab)
@@ -0,0 +1,186 @@
+import base64
+import builtins
+import json
+import os.path
+from collections import deque, OrderedDict
+from functools import partial
+
+from storyminer.docstore import DocStore
+from storyminer.pipeline import normalize
+from storyminer.userstory import UserStorySet, WithMain, export_default
+
+# Fields of an exported user story, and of its parts, that hold a doc
+DOC_FIELDS = ['doc', 'old_doc']
+PART_DOC_FIELDS = [('role', 'doc'), ('means', 'doc'), ('ends', 'doc')]
+
+class Previous(object):
+	"""Exported user stories of an earlier run, looked up by their normalized text"""
+	def __init__(self, stories, vocab, store=None):
+		"""
+		:param stories: List of exported user stories (dictionaries)
+		:param vocab: Vocab to load the docs of carried over user stories with
+		:param store: Optional DocStore, if the docs were written to a DocBin sidecar
+		"""
+		self.vocab = vocab
+		self.store = store
+		self.by_text = {}
+		self.by_id = OrderedDict()
+		for story in stories:
+			self.by_text.setdefault(normalize(story['text']), deque()).append(story)
+			self.by_id[story['id']] = story
+		self.used = set()
+
+	def take(self, text):
+		"""Takes an unused earlier user story with the same normalized text
+
+		:param text: Normalized text of the user story
+		:returns: The exported user story, or None
+		"""
+		stories = self.by_text.get(text)
+		if stories:
+			story = stories.popleft()
+			self.used.add(id(story))
+			return story
+		return None
+
+	def is_used(self, id):
+		"""Sees if the earlier user story with an ID was carried over"""
+		return id in self.by_id and builtins.id(self.by_id[id]) in self.used
+
+	def remaining(self, replaced):
+		"""Gets the IDs of earlier user stories that were neither carried over nor replaced by a changed one
+
+		:param replaced: Set of IDs of changed user stories
+		:returns: List of IDs
+		"""
+		return [i for i, story in self.by_id.items() if i not in replaced and id(story) not in self.used]
+
+def load_previous(path, vocab):
+	"""Loads the output of an earlier run
+
+	If a DocBin sidecar (.spacy) is next to the output file, the docs are loaded from it when needed.
+
+	:param path: Name and location of a JSON or JSON lines output file
+	:param vocab: Vocab to load the docs with
+	:returns: Previous
+	"""
+	with open(path, encoding='utf-8') as f:
+		if path.endswith(".ndjson"):
+			stories = [json.loads(line) for line in f if line.strip()]
+		else:
+			stories = json.load(f)['set']
+	sidecar = os.path.splitext(path)[0] + ".spacy"
+	store = DocStore(sidecar, vocab) if os.path.exists(sidecar) else None
+	return Previous(stories, vocab, store)
+
+def load_set(output):
+	"""Loads exported user stories as a UserStorySet of carried over user stories, such as the output of a mining server
+
+	:param output: JSON text, as produced by UserStorySet.toJSON
+	:returns: UserStorySet
+	"""
+	exported = json.loads(output)
+	user_stories = UserStorySet.__new__(UserStorySet)
+	user_stories.system = WithMain()
+	user_stories.system.main = exported['system']['main']
+	user_stories.set = [CarriedUserStory(story, story['id'], story['text'], None) for story in exported['set']]
+	return user_stories
+
+class CarriedUserStory(object):
+	"""An unchanged user story of which the earlier output is exported again, instead of mining it"""
+	def __init__(self, exported, id, text, previous):
+		self.__dict__ = dict(exported)
+		self.id = id
+		# Like parse(), mined user stories keep their text without trailing whitespace and failed ones as read
+		self.text = text if 'error' in exported else text.rstrip()
+		self._previous = previous
+
+	def export(self):
+		# Docs are exported again, so that they end up in the sidecar or inline like the mined ones
+		previous = self.__dict__.pop('_previous', None)
+		if previous is None:
+			return
+		loaded = {}
+		for field in DOC_FIELDS:
+			if field in self.__dict__:
+				self.__dict__[field] = _load_doc(self.__dict__[field], previous, loaded)
+		for part, field in PART_DOC_FIELDS:
+			if isinstance(self.__dict__.get(part), dict) and field in self.__dict__[part]:
+				self.__dict__[part] = dict(self.__dict__[part])
+				self.__dict__[part][field] = _load_doc(self.__dict__[part][field], previous, loaded)
+
+	def toJSON(self, docs=None):
+		"""Exports the user story as a single line of JSON
+
+		:param docs: Optional DocSidecar to put docs in, instead of inlining them
+		"""
+		self.export()
+		line = json.dumps(self, default=partial(export_default, docs=docs), ensure_ascii=False)
+		if docs is not None:
+			docs.forget()
+		return line
+
+def _load_doc(value, previous, loaded):
+	# Loads an exported doc once per user story, so that docs that were shared stay shared
+	if type(value) is int and previous.store is not None:
+		if value not in loaded:
+			loaded[value] = previous.store[value]
+		return loaded[value]
+	elif type(value) is str and value:
+		if value not in loaded:
+			from spacy.tokens import Doc
+			loaded[value] = Doc(previous.vocab).from_bytes(base64.decodebytes(value.encode('ascii')))
+		return loaded[value]
+	return value
+
+class ChangeSummary(object):
+	"""IDs of the new, changed, unchanged and deleted user stories of an incremental run"""
+	def __init__(self):
+		self.new = []
+		self.changed = []
+		self.unchanged = []
+		self.deleted = []
+
+def remine(stories, previous, mine, summary=None):
+	"""Mines only the user stories that are new or changed since an earlier run
+
+	A user story is unchanged if an earlier user story has the same normalized text, its output is then
+	carried over with the new ID. Otherwise it is changed if its ID was in the earlier run and that earlier
+	user story was not carried over, or new if not. Earlier user stories that are left are deleted.
+
+	:param stories: Iterable of (ID, text) pairs
+	:param previous: Previous, as returned by load_previous
+	:param mine: Function that mines an iterable of (ID, text) pairs, and yields the results in the same order
+	:param summary: Optional ChangeSummary, filled as the user stories are read
+	:returns: Generator of UserStory, FailedUserStory and CarriedUserStory objects, in input order
+	"""
+	if summary is None:
+		summary = ChangeSummary()
+	order = deque()
+	mined = []
+
+	def pending():
+		for id, text in stories:
+			exported = previous.take(normalize(text))
+			if exported is not None:
+				summary.unchanged.append(id)
+				order.append(CarriedUserStory(exported, id, text, previous))
+				continue
+			mined.append(id)
+			order.append(None)
+			yield id, text
+		# Earlier user stories may be carried over after their ID was seen, so changes are known at the end
+		for i in mined:
+			if i in previous.by_id and not previous.is_used(i):
+				summary.changed.append(i)
+			else:
+				summary.new.append(i)
+		summary.deleted = previous.remaining(set(summary.changed))
+
+	for us in mine(pending()):
+		while order[0] is not None:
+			yield order.popleft()
+		order.popleft()
+		yield us
+	while order:
+		yield order.popleft()
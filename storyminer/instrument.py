@@ -0,0 +1,259 @@
+import heapq
+import json
+import math
+import timeit
+
+# Stages that are timed, in the order they run. Free-form extraction is part of mining, and is timed within it.
+STAGES = ['read', 'normalize', 'parse', 'structure', 'mine', 'free_form', 'export', 'write']
+PERCENTILES = [50, 95, 99]
+DEFAULT_SLOWEST = 10
+
+class Histogram(object):
+	"""Latencies in logarithmic buckets, so that its size does not grow with the number of user stories"""
+	# Ratio between the bounds of consecutive buckets, which is the precision of the percentiles
+	GROWTH = 1.05
+	# Latencies below a microsecond all go in the first bucket
+	MINIMUM = 1e-6
+
+	def __init__(self, slowest=DEFAULT_SLOWEST):
+		"""
+		:param slowest: Number of slowest user stories to keep the IDs of
+		"""
+		self.buckets = {}
+		self.count = 0
+		self.total = 0.0
+		self.max = 0.0
+		self.slowest = []
+		self.keep = slowest
+
+	def add(self, seconds, id=None):
+		bucket = int(math.log(max(seconds, self.MINIMUM) / self.MINIMUM, self.GROWTH))
+		self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+		self.count += 1
+		self.total += seconds
+		self.max = max(self.max, seconds)
+		if id is not None:
+			self.add_slowest(seconds, id)
+
+	def merge(self, other):
+		for bucket, n in other.buckets.items():
+			self.buckets[bucket] = self.buckets.get(bucket, 0) + n
+		self.count += other.count
+		self.total += other.total
+		self.max = max(self.max, other.max)
+		for seconds, id in other.slowest:
+			self.add_slowest(seconds, id)
+
+	def add_slowest(self, seconds, id):
+		if not self.keep:
+			return
+		if len(self.slowest) < self.keep:
+			heapq.heappush(self.slowest, (seconds, id))
+		elif seconds > self.slowest[0][0]:
+			heapq.heapreplace(self.slowest, (seconds, id))
+
+	def percentile(self, p):
+		"""Latency below which p percent of the latencies are
+
+		:param p: Percentage
+		:returns: Upper bound of the bucket of that latency, in seconds
+		"""
+		if not self.count:
+			return 0.0
+		rank = math.ceil(self.count * p / 100)
+		seen = 0
+		for bucket in sorted(self.buckets):
+			seen += self.buckets[bucket]
+			if seen >= rank:
+				return min(self.MINIMUM * self.GROWTH ** (bucket + 1), self.max)
+		return self.max
+
+	def to_dict(self):
+		d = {'count': self.count, 'total': self.total, 'mean': self.total / self.count if self.count else 0.0, 'max': self.max}
+		for p in PERCENTILES:
+			d['p' + str(p)] = self.percentile(p)
+		d['slowest'] = [{'id': id, 'seconds': seconds} for seconds, id in sorted(self.slowest, reverse=True)]
+		return d
+
+class Instrument(object):
+	"""Times the stages of mining, per user story
+
+	Timings are collected in a Histogram per stage. Hooks are called with every timing as it is taken.
+	"""
+	def __init__(self, slowest=DEFAULT_SLOWEST, clock=timeit.default_timer):
+		"""
+		:param slowest: Number of slowest user stories to keep the IDs of, per stage
+		:param clock: Function that returns the time in seconds
+		"""
+		self.slowest = slowest
+		self.clock = clock
+		self.histograms = {stage: Histogram(slowest) for stage in STAGES}
+		self.hooks = []
+		# Per user story that is being mined, its seconds per stage so far, see stories
+		self.totals = {}
+
+	def add_hook(self, hook):
+		"""Calls hook(stage, id, seconds) after each timing
+
+		:param hook: Function; id is None for stages that are not timed per user story
+		"""
+		self.hooks.append(hook)
+
+	def time(self, stage, id=None):
+		"""Times a stage of a user story
+
+		:param stage: One of STAGES
+		:param id: ID of the user story, or None
+		:returns: Context manager
+		"""
+		return Timing(self, stage, id)
+
+	def time_batch(self, stage, ids):
+		"""Times a stage of many user stories at once, such as a call of nlp.pipe
+
+		Every user story is recorded with an equal share of the time taken.
+
+		:param stage: One of STAGES
+		:param ids: List of the IDs of the user stories
+		:returns: Context manager
+		"""
+		return Timing(self, stage, ids, batch=True)
+
+	def stories(self, ids):
+		"""Adds up the timings of each stage of user stories, and records them when done
+
+		Stages that run more than once per user story, such as parse, then give one latency per user story.
+
+		:param ids: List of the IDs of the user stories
+		:returns: Context manager
+		"""
+		return Totals(self, ids)
+
+	def record(self, stage, seconds, id=None):
+		totals = self.totals.get(id) if id is not None else None
+		if totals is not None:
+			total = totals.setdefault(stage, [0.0, False])
+			total[0] += seconds
+			total[1] = True
+			return
+		self.add(stage, seconds, id)
+
+	def record_batch(self, stage, seconds, ids):
+		if not ids:
+			return
+		# The IDs are not kept as slowest user stories, as they all took the same share
+		share = seconds / len(ids)
+		for id in ids:
+			totals = self.totals.get(id)
+			if totals is not None:
+				totals.setdefault(stage, [0.0, False])[0] += share
+			else:
+				self.add(stage, share, id, slowest=False)
+
+	def add(self, stage, seconds, id=None, slowest=True):
+		"""Adds a latency to the histogram of a stage, and calls the hooks with it
+
+		:param slowest: Keep the ID as one of the slowest user stories
+		"""
+		self.histograms[stage].add(seconds, id if slowest else None)
+		for hook in self.hooks:
+			hook(stage, id, seconds)
+
+	def timed(self, stage, stories):
+		"""Times the reading of every user story from an iterable
+
+		:param stage: One of STAGES
+		:param stories: Iterable of (ID, text) pairs
+		:returns: Generator of the same pairs
+		"""
+		stories = iter(stories)
+		while True:
+			start = self.clock()
+			try:
+				story = next(stories)
+			except StopIteration:
+				return
+			self.record(stage, self.clock() - start, story[0])
+			yield story
+
+	def take(self):
+		"""Returns the histograms and starts new ones, so that worker processes can send their timings"""
+		histograms = self.histograms
+		self.histograms = {stage: Histogram(self.slowest) for stage in STAGES}
+		return histograms
+
+	def merge(self, histograms):
+		for stage, histogram in histograms.items():
+			self.histograms[stage].merge(histogram)
+
+	def report(self):
+		"""
+		:returns: Dictionary with the count, total, mean, max, percentiles and slowest user stories per timed stage
+		"""
+		return {'unit': 'seconds', 'stages': {stage: h.to_dict() for stage, h in self.histograms.items() if h.count}}
+
+	def write(self, filename):
+		with open(filename, 'w') as f:
+			json.dump(self.report(), f, indent=4)
+
+class Timing(object):
+	def __init__(self, instrument, stage, id, batch=False):
+		self.instrument = instrument
+		self.stage = stage
+		self.id = id
+		self.batch = batch
+
+	def __enter__(self):
+		self.start = self.instrument.clock()
+		return self
+
+	def __exit__(self, *exc):
+		seconds = self.instrument.clock() - self.start
+		if self.batch:
+			self.instrument.record_batch(self.stage, seconds, self.id)
+		else:
+			self.instrument.record(self.stage, seconds, self.id)
+
+class Totals(object):
+	def __init__(self, instrument, ids):
+		self.instrument = instrument
+		self.ids = ids
+
+	def __enter__(self):
+		for id in self.ids:
+			self.instrument.totals[id] = {}
+		return self
+
+	def __exit__(self, *exc):
+		for id in self.ids:
+			totals = self.instrument.totals.pop(id, None) or {}
+			# Only user stories that were timed on their own, not just as a share of a batch, are kept as slowest
+			for stage, (seconds, timed) in totals.items():
+				self.instrument.add(stage, seconds, id, slowest=timed)
+
+class NoInstrument(object):
+	"""Instrument that times nothing, used when no timings are wanted"""
+	def time(self, stage, id=None):
+		return _NOTHING
+
+	def time_batch(self, stage, ids):
+		return _NOTHING
+
+	def stories(self, ids):
+		return _NOTHING
+
+	def timed(self, stage, stories):
+		return stories
+
+	def __bool__(self):
+		return False
+
+class _Nothing(object):
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		pass
+
+_NOTHING = _Nothing()
+NO_INSTRUMENT = NoInstrument()
@@ -1,8 +1,49 @@
 import os.path
+import sys
 import csv
-import pandas
+import mmap
 
 class Reader:
+	def stream(source, renumber=False, skip_blank=True, encoding='utf-8'):
+		"""Lazily reads the lines of a file, memory-mapping regular files
+
+		:param source: Path of the input file, '-' for stdin, or an open file
+		:param renumber: Number lines consecutively, not counting skipped blank lines, instead of by line number
+		:param skip_blank: Skip lines that contain only whitespace
+		:param encoding: Encoding of the input file
+		:returns: Generator of (number, line) pairs
+		"""
+		number = 0
+		for line_number, line in enumerate(Reader.lines(source, encoding), 1):
+			if skip_blank and (not line or line.isspace()):
+				continue
+			number += 1
+			yield (number if renumber else line_number), line
+
+	def lines(source, encoding='utf-8'):
+		"""Lazily reads the lines of a file, memory-mapping regular files
+
+		:param source: Path of the input file, '-' for stdin, or an open file
+		:param encoding: Encoding of the input file
+		:returns: Generator of lines, with universal newlines
+		"""
+		if source == '-':
+			yield from sys.stdin
+		elif hasattr(source, 'read'):
+			with source:
+				yield from source
+		elif not os.path.isfile(source):
+			# Pipes, FIFOs and devices such as /dev/stdin cannot be memory-mapped and have no size, so they are read as text
+			with open(source, encoding=encoding, newline=None) as f:
+				yield from f
+		elif os.path.getsize(source) > 0:
+			with open(source, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+				for line in iter(m.readline, b''):
+					line = line.decode(encoding)
+					if line.endswith('\r\n'):
+						line = line[:-2] + '\n'
+					yield line
+
 	def parse(open_file):
 		"""Parses a previously open file
 
@@ -29,25 +70,57 @@ class Writer:
 		:param content: Content to write to file
 		:returns: Name and location of the file
 		"""
+		outputname = self.make_name(dirname, filename, filetype)
+
+		if outputname.endswith(".csv"):
+			self.writecsv(outputname, content)
+		else:
+			self.write(outputname, content)			
+
+		return outputname
+
+	def make_name(self, dirname, filename, filetype):
+		"""Makes the target directory and picks the name of a new output file
+
+		:param dirname: Name of the target directory
+		:param filename: File name (without extension)
+		:param filetype: Type of file
+		:returns: Name and location of the file
+		"""
 		if not os.path.exists(dirname):
 	    		os.makedirs(dirname)
 	
-		outputname = ""
 		filetype = "." + str(filetype)
 		potential_outp = dirname + "/" + filename
 
 		if self.number == 1:			
 			while os.path.exists(potential_outp + str(self.number) + filetype):
 					self.number += 1
-		outputname = potential_outp + str(self.number) + filetype
+		return potential_outp + str(self.number) + filetype
 
+	def make_stream(self, dirname, filename, filetype, flush_every=None):
+		"""Makes a file to write lines to as they come in
 
-		if filetype == ".csv":			
-			self.writecsv(outputname, content)
-		else:
-			self.write(outputname, content)			
+		:param dirname: Name of the target directory
+		:param filename: File name (without extension)
+		:param filetype: Type of file
+		:param flush_every: Number of lines after which the file is flushed
+		:returns: An open LineWriter
+		"""
+		return LineWriter(self.make_name(dirname, filename, filetype), flush_every)
 
-		return outputname
+	def make_columnar(self, dirname, filename, format=None, chunk_size=None):
+		"""Makes a file to write mined user stories to as a flat table, in chunks as they come in
+
+		:param dirname: Name of the target directory
+		:param filename: File name (without extension)
+		:param format: 'parquet' or 'csv', by default Parquet if pyarrow is installed
+		:param chunk_size: Number of user stories per chunk
+		:returns: An open ColumnarWriter (see storyminer.columnar)
+		"""
+		from storyminer.columnar import ColumnarWriter, default_format
+		format = format or default_format()
+		return ColumnarWriter(self.make_name(dirname, filename, format), format, chunk_size)
 
 	def write(self, outputname, text):
 		"""Writes text to a file
@@ -66,8 +139,43 @@ class Writer:
 		:param li: List/array/DataFrame
 		"""
 		with open(outputname, 'wt') as f:
-			if isinstance(li, pandas.core.frame.DataFrame):
+			# A DataFrame writes itself, so that pandas is not imported unless it is used
+			if hasattr(li, 'to_csv'):
 				li.to_csv(path_or_buf=f, sep=",", quotechar='"', quoting=csv.QUOTE_NONNUMERIC)
 			else:
 				writer = csv.writer(f, delimiter=",", quotechar='"', quoting=csv.QUOTE_NONNUMERIC)
 				writer.writerows(li)
+
+class LineWriter(object):
+	DEFAULT_FLUSH = 1000
+
+	def __init__(self, outputname, flush_every=None):
+		"""Opens a file to write lines to
+
+		:param outputname: Name and location of the output file
+		:param flush_every: Number of lines after which the file is flushed
+		"""
+		self.name = outputname
+		self.flush_every = flush_every or LineWriter.DEFAULT_FLUSH
+		self.lines = 0
+		self.file = open(outputname, 'w')
+
+	def write(self, line):
+		"""Writes a line, and flushes if flush_every lines were written since the last flush
+
+		:param line: Text without trailing newline
+		"""
+		self.file.write(line)
+		self.file.write("\n")
+		self.lines += 1
+		if self.lines % self.flush_every == 0:
+			self.file.flush()
+
+	def close(self):
+		self.file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
@@ -0,0 +1,137 @@
+import re
+from bisect import bisect_right
+
+from lang.en.indicators import ROLE_INDICATORS, MEANS_INDICATORS, ENDS_INDICATORS
+
+INDICATOR_TYPES = ['role', 'means', 'ends']
+NOT_FOUND = ('', -1)
+
+class IndicatorMatcher(object):
+	"""Finds the role, means and ends indicators of user story sentences
+
+	All indicators are compiled into a single trie-shaped regular expression, which finds the
+	leftmost-longest indicator of every type in one scan of a sentence. As before, a role indicator
+	needs to be followed by a space and means and ends indicators need to be surrounded by spaces.
+	"""
+	def __init__(self, role=ROLE_INDICATORS, means=MEANS_INDICATORS, ends=ENDS_INDICATORS):
+		self.indicators = {}
+		keys = []
+
+		for indicator_type, indicators in zip(INDICATOR_TYPES, [role, means, ends]):
+			type_keys = []
+			for indicator in indicators:
+				# The trailing space is matched by a lookahead, so it can still start the next indicator
+				if indicator_type == 'role':
+					key = str.lower(indicator)
+				else:
+					key = " " + str.lower(indicator)
+				if key not in self.indicators:
+					self.indicators[key] = (INDICATOR_TYPES.index(indicator_type), indicator)
+					type_keys.append(key)
+			keys.append(type_keys)
+
+		self.pattern = re.compile(trie_regex(self.indicators) + '(?= )')
+		self.patterns = [re.compile(trie_regex(type_keys) + '(?= )') for type_keys in keys]
+
+		# A single scan misses an indicator that overlaps with an indicator of another type
+		self.single_scan = not any(overlaps(a, b) or overlaps(b, a)
+			for i, type_keys in enumerate(keys) for other in keys[i + 1:] for a in type_keys for b in other)
+
+	def match(self, sentence):
+		"""Finds the indicators of a sentence
+
+		:param sentence: User story sentence
+		:returns: Tuple of (indicator, index) for role, means and ends, with ('', -1) if not found
+		"""
+		l_sentence = str.lower(sentence)
+		if not self.single_scan:
+			return tuple(self._found(p.search(l_sentence)) for p in self.patterns)
+
+		found = [NOT_FOUND, NOT_FOUND, NOT_FOUND]
+		missing = len(found)
+		for m in self.pattern.finditer(l_sentence):
+			t, indicator = self.indicators[m.group()]
+			if found[t] is NOT_FOUND:
+				found[t] = (indicator, m.start())
+				missing -= 1
+				if not missing:
+					break
+		return tuple(found)
+
+	def match_all(self, sentences):
+		"""Finds the indicators of many sentences in a single scan
+
+		:param sentences: List of user story sentences
+		:returns: List of results of match(), in the order of sentences
+		"""
+		if not self.single_scan:
+			return [self.match(s) for s in sentences]
+
+		starts = []
+		lowered = []
+		offset = 0
+		for s in sentences:
+			l_sentence = str.lower(s)
+			starts.append(offset)
+			lowered.append(l_sentence)
+			offset += len(l_sentence) + 1
+		starts.append(offset)
+
+		# One column per indicator type, to keep the number of objects per sentence low
+		found = [[NOT_FOUND] * len(sentences) for _ in INDICATOR_TYPES]
+		n = 0
+		next_start = starts[1] if sentences else offset
+
+		# Indicators do not contain newlines, so no match crosses two sentences
+		for m in self.pattern.finditer('\n'.join(lowered)):
+			start = m.start()
+			if start >= next_start:
+				n = bisect_right(starts, start, n) - 1
+				next_start = starts[n + 1]
+			t, indicator = self.indicators[m.group()]
+			if found[t][n] is NOT_FOUND:
+				found[t][n] = (indicator, start - starts[n])
+		return list(zip(*found))
+
+	def _found(self, m):
+		if m is None:
+			return NOT_FOUND
+		return (self.indicators[m.group()][1], m.start())
+
+def trie_regex(words):
+	"""Compiles words into a regular expression that shares their common prefixes
+
+	Where a word is a prefix of another word, the longer word is tried first.
+
+	:param words: Iterable of words
+	:returns: Regular expression string
+	"""
+	trie = {}
+	for word in words:
+		node = trie
+		for c in word:
+			node = node.setdefault(c, {})
+		node[''] = {}
+
+	def build(node):
+		alternatives = [re.escape(c) + build(child) for c, child in sorted(node.items()) if c]
+		if not alternatives:
+			return ''
+		if len(alternatives) == 1 and '' not in node:
+			return alternatives[0]
+		body = '(?:' + '|'.join(alternatives) + ')'
+		if '' in node:
+			return body + '?'
+		return body
+
+	return build(trie)
+
+def overlaps(a, b):
+	"""Sees if an occurrence of word b can start inside an occurrence of word a
+
+	:returns: Boolean
+	"""
+	for k in range(len(a)):
+		if a[k:].startswith(b) or b.startswith(a[k:]):
+			return True
+	return False
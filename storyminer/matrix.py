@@ -0,0 +1,156 @@
+from array import array
+
+from storyminer.columnar import get_attr, get_path
+from storyminer.userstory import FailedUserStory
+from storyminer.utility import CaseMemo
+
+DEFAULT_BASE = 1
+# Weights of the terms by where they occur in a user story; the compound weight is relative to its parent
+DEFAULT_WEIGHTS = {'func_role': 1.0, 'main_obj': 1.0, 'means_noun': 0.7, 'ends_noun': 0.5, 'compound': 0.66}
+DEFAULT_THRESHOLD = 1.0
+DEFAULT_TOP = 10
+
+class FactorMatrix(object):
+	"""Sparse term x user story matrix, of the weight of every term in every mined user story
+
+	Terms are normalized with get_case (see CaseMemo), so that a noun and its plural are one term. A term that
+	occurs in a user story more than once gets its highest weight there. The matrix is kept as coordinate arrays that
+	grow as user stories are added, and is never made dense.
+	"""
+	def __init__(self, base=DEFAULT_BASE, weights=None):
+		"""
+		:param base: Weight that the absolute weights are multiplied by
+		:param weights: Dictionary of weights to use instead of those in DEFAULT_WEIGHTS
+		"""
+		weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+		self.base = base
+		self.VAL_FUNC_ROLE = base * weights['func_role']
+		self.VAL_MAIN_OBJ = base * weights['main_obj']
+		self.VAL_MEANS_NOUN = base * weights['means_noun']
+		self.VAL_ENDS_NOUN = base * weights['ends_noun']
+		self.VAL_COMPOUND = weights['compound']
+		# Row of every term, and term of every row
+		self.terms = {}
+		self.vocabulary = []
+		# User story ID of every column
+		self.ids = []
+		self.rows = array('i')
+		self.cols = array('i')
+		self.data = array('d')
+		self.case = CaseMemo()
+		self._totals = None
+
+	def add(self, story):
+		"""Adds a column for a mined user story; failed user stories are skipped
+
+		:param story: UserStory, compact or carried over user story
+		"""
+		if type(story) is FailedUserStory or get_attr(story, 'error') is not None:
+			return
+		weights = {}
+		for term, weight in self.factors(story):
+			if term and weight > weights.get(term, 0):
+				weights[term] = weight
+		col = len(self.ids)
+		self.ids.append(story.id)
+		for term, weight in weights.items():
+			row = self.terms.get(term)
+			if row is None:
+				row = self.terms[term] = len(self.vocabulary)
+				self.vocabulary.append(term)
+			self.rows.append(row)
+			self.cols.append(col)
+			self.data.append(weight)
+		self._totals = None
+
+	def update(self, stories):
+		"""Adds a chunk of mined user stories
+
+		:param stories: Iterable of mined user stories
+		:returns: The FactorMatrix
+		"""
+		for story in stories:
+			self.add(story)
+		return self
+
+	def factors(self, story):
+		"""
+		:returns: Generator of the (term, weight) pairs of a user story
+		"""
+		role = get_path(story, 'role.functional_role')
+		yield from self.weighted(role, self.VAL_FUNC_ROLE)
+		parts = [('means', self.VAL_MEANS_NOUN)]
+		if get_attr(story, 'has_ends'):
+			parts.append(('ends', self.VAL_ENDS_NOUN))
+		for name, noun in parts:
+			part = get_attr(story, name)
+			yield from self.weighted(get_attr(part, 'main_object'), self.VAL_MAIN_OBJ)
+			for token in get_attr(part, 'nouns') or []:
+				yield self.case(token), noun
+			for compound in get_attr(part, 'compounds') or []:
+				yield self.case(compound), noun * self.VAL_COMPOUND
+
+	def weighted(self, main, weight):
+		if main is None:
+			return
+		yield self.case(get_attr(main, 'main')), weight
+		compound = get_attr(main, 'compound')
+		if compound:
+			yield self.case(compound), weight * self.VAL_COMPOUND
+
+	def shape(self):
+		return len(self.vocabulary), len(self.ids)
+
+	def matrix(self):
+		"""
+		:returns: scipy.sparse.csr_matrix of the weights, with a row per term and a column per user story
+		"""
+		import numpy as np
+		from scipy.sparse import coo_matrix
+		rows, cols, data = (np.frombuffer(a, dtype=a.typecode) for a in (self.rows, self.cols, self.data))
+		return coo_matrix((data, (rows, cols)), shape=self.shape()).tocsr()
+
+	def totals(self):
+		"""
+		:returns: NumPy array of the summed weight of every term, by row
+		"""
+		if self._totals is None:
+			import numpy as np
+			rows = np.frombuffer(self.rows, dtype=self.rows.typecode)
+			data = np.frombuffer(self.data, dtype=self.data.typecode)
+			self._totals = np.bincount(rows, weights=data, minlength=len(self.vocabulary))
+		return self._totals
+
+	def threshold(self, value=DEFAULT_THRESHOLD):
+		"""
+		:param value: Lowest summed weight of the terms to get
+		:returns: List of (term, summed weight) pairs of the terms with at least that weight, highest first
+		"""
+		import numpy as np
+		totals = self.totals()
+		rows = np.flatnonzero(totals >= value)
+		return self._terms(rows[np.argsort(-totals[rows], kind='stable')], totals)
+
+	def top(self, k=DEFAULT_TOP, id=None):
+		"""
+		:param k: Number of terms to get
+		:param id: ID of a user story, to get its terms instead of those of all user stories
+		:returns: List of (term, weight) pairs of the k terms with the highest (summed) weight, highest first
+		"""
+		import numpy as np
+		if id is None:
+			totals = self.totals()
+		else:
+			col = self.ids.index(id)
+			entries = np.flatnonzero(np.frombuffer(self.cols, dtype=self.cols.typecode) == col)
+			totals = np.zeros(len(self.vocabulary))
+			totals[np.frombuffer(self.rows, dtype=self.rows.typecode)[entries]] = \
+				np.frombuffer(self.data, dtype=self.data.typecode)[entries]
+		k = min(k, np.count_nonzero(totals))
+		if k <= 0:
+			return []
+		rows = np.argpartition(-totals, k - 1)[:k]
+		return self._terms(rows[np.argsort(-totals[rows], kind='stable')], totals)
+
+	def _terms(self, rows, totals):
+		return [(self.vocabulary[row], float(totals[row])) for row in rows]
@@ -1,9 +1,19 @@
+from operator import attrgetter
+
 from storyminer.utility import *
 from storyminer.userstory import Ends
+from storyminer.cache import LRUCache, DEFAULT_PART_CACHE, DEFAULT_ROLE_CACHE
+from storyminer.instrument import NO_INSTRUMENT
+from storyminer.matcher import IndicatorMatcher
 from lang.en.indicators import *
 
+# Accessors for the parts and docs of a user story, so that no attribute paths are compiled at runtime
+PARTS = {part: attrgetter(part) for part in ['role', 'means', 'ends']}
+DOCS = {path: attrgetter(path) for path in ['doc', 'role.doc', 'means.doc', 'ends.doc']}
+
 def _get(story, assignment, method, source, part='means'):
-		exec("story.{0}.{1} = MinerUtility.{2}(story, story.{0}.{3})".format(part, assignment, method, source))
+		p = PARTS[part](story)
+		setattr(p, assignment, method(story, getattr(p, source)))
 		return story
 
 def me_get(story, assignment, method, source):
@@ -13,23 +23,42 @@ def me_get(story, assignment, method, source):
 	return story
 
 class StoryMiner:
-	def __init__(self, system):
+	def __init__(self, system, part_cache=DEFAULT_PART_CACHE, role_cache=DEFAULT_ROLE_CACHE):
+		"""
+		:param system: The system WithMain of the user story set
+		:param part_cache: Number of parsed role, means and ends texts to keep, so that repeated parts are not parsed again
+		:param role_cache: Number of functional roles to keep by role text and parse
+		"""
 		self.system = system
+		# Parsed docs are shared by the user stories with the same part text, and are not changed by mining
+		self.part_cache = LRUCache(part_cache)
+		self.role_cache = LRUCache(role_cache)
+		self.matcher = IndicatorMatcher()
+		self.phrases = {'means': self.get_means_phrases, 'ends': self.get_ends_phrases}
+		# Times the stages of mining, see storyminer.instrument
+		self.instrument = NO_INSTRUMENT
+
+	def structure(self, story, indicators=None):
+		story = self.get_indicators(story, indicators)
+		self.check_indicators(story)
+		story = self.get_I(story)
 
-	def structure(self, story):
-		story = self.get_indicators(story)
-
+	def check_indicators(self, story):
 		if not story.role.indicator:
 			raise ValueError('indicator-missing-role', 0)
 		if not story.means.indicator:
 			raise ValueError('indicator-missing-means', 1)
 
-		story = self.get_I(story)
-
 	def mine(self, story, nlp):
 		story = self.get_part_text(story)
 		story = self.nlp_part(story, nlp)
+		self.extract(story)
+
+	def extract(self, story):
+		"""Mines a story of which the role, means and ends docs have already been set
 
+		:param story: A structured user story with parsed parts
+		"""
 		story = self.get_functional_role(story)
 		if not story.role.functional_role:
 			raise ValueError('no-functional_role', 2)
@@ -43,50 +72,17 @@ class StoryMiner:
 		if story.has_ends:
 			story = self.get_mobj_and_mv(story, 'ends')
 
-		story = self.get_free_form(story)
-
-	# New method
-	def get_indicators(self, story):
-		indicator_types = ['Role', 'Means', 'Ends']
-		returnlist = []
-
-		for indicator_type in indicator_types:
-			found_ind = []
-			found_i = []
+		with self.instrument.time('free_form', story.id):
+			story = self.get_free_form(story)
 
-			l_sentence = str.lower(story.sentence)
+	def get_indicators(self, story, indicators=None):
+		"""Sets the role, means and ends indicators of a story
 
-			for indicator in eval(indicator_type.upper() + '_INDICATORS'):
-				if indicator_type.lower() == 'role':
-					i = str.lower(indicator) + " "
-				else:
-					i = " " + str.lower(indicator) + " "
-
-				if i in l_sentence:
-					found_ind.append([l_sentence.find(i), indicator])
+		:param story: A new user story
+		:param indicators: Indicators found by IndicatorMatcher.match_all, or None to find them here
+		"""
+		returnlist = indicators or self.matcher.match(story.sentence)
 
-			# Get the one(s) at the lowest index			
-			places = [i[0] for i in found_ind]
-			if places:
-				p_min = min(places)
-			else:
-				p_min = -1
-
-			for i in found_ind:
-				if i[0] > p_min:
-					found_ind.remove(i)
-			for i in found_ind:
-				found_i.append(i[1])
-
-			# If multiple remain, get the longest match
-			if found_i:
-				if len(found_i) > 1:
-					returnlist.append([max(found_i, key=len), p_min])
-				else:
-					returnlist.append([found_i[0], p_min])
-			else:
-				returnlist.append(['', p_min])
-			
 		story.role.indicator, story.role.indicator_i = returnlist[0]
 		story.means.indicator, story.means.indicator_i = returnlist[1]
 
@@ -139,14 +135,49 @@ class StoryMiner:
 		return story
 
 	def nlp_part(self, story, nlp):
-		story.role.doc = nlp(story.role.t)
-		story.means.doc = nlp(story.means.simplified)
+		story.role.doc = self.parse_part(story.role.t, nlp)
+		story.means.doc = self.parse_part(story.means.simplified, nlp)
 		if story.has_ends:
-			story.ends.doc = nlp(story.ends.simplified)
+			story.ends.doc = self.parse_part(story.ends.simplified, nlp)
 
 		return story
 
+	def parse_part(self, text, nlp):
+		"""Parses the text of a role, means or ends, or gets its doc from the part cache"""
+		doc = self.part_cache.get(text)
+		if doc is None:
+			doc = nlp(text)
+			self.part_cache.put(text, doc)
+		return doc
+
 	def get_functional_role(self, story):
+		"""Gets the functional role of a story, from the role cache if its role was mined before
+
+		The functional role only depends on the role doc, so it is cached by the role text and its parse. The text
+		alone is not enough: the same text can be parsed differently, such as when it is a span of a longer parse in
+		single-parse mining, and the cached role is a set of token positions that must mean the same in the new doc.
+		"""
+		if self.role_cache.maxsize <= 0:
+			return self._get_functional_role(story)
+		doc = story.role.doc
+		key = (story.role.t, tuple((t.orth, t.tag, t.dep, t.head.i) for t in doc))
+		cached = self.role_cache.get(key)
+		if cached is not None:
+			main, compound = cached
+			if compound is not None:
+				story.role.functional_role.compound = [doc[i] for i in compound]
+			if main is not None:
+				story.role.functional_role.main = doc[main]
+			return story
+
+		story = self._get_functional_role(story)
+		role = story.role.functional_role
+		main = None if isinstance(role.main, list) else role.main.i
+		compound = [t.i for t in role.compound] if hasattr(role, 'compound') else None
+		self.role_cache.put(key, (main, compound))
+		return story
+
+	def _get_functional_role(self, story):
 		potential_without_with = []
 
 		with_i = -1
@@ -197,9 +228,10 @@ class StoryMiner:
 		main_verb = []
 		main_object = []
 		mv_phrase = []
+		doc = PARTS[part](story).doc
 
 		# Simple case if the subj and dobj are linked by a verb
-		for token in eval('story.' + str(part) + '.doc'):
+		for token in doc:
 			if is_subject(token):
 				has_subj = True
 				subject = token
@@ -210,9 +242,9 @@ class StoryMiner:
 					break
 
 		if type(subject) is list:
-			subject = eval('story.' + str(part) + '.doc')[0]
+			subject = doc[0]
 
-		for token in eval('story.' + str(part) + '.doc'):
+		for token in doc:
 			if is_dobj(token):
 				found_obj = True
 
@@ -244,7 +276,7 @@ class StoryMiner:
 	
 		# If the root of the sentence is a verb
 		if not simple:
-			for token in eval('story.' + str(part) + '.doc'):
+			for token in doc:
 				if token.dep_ == 'ROOT' and is_verb(token):
 					found_verb = True
 					main_verb = token
@@ -254,14 +286,14 @@ class StoryMiner:
 		# Possibly a NLP error...
 		if not found_verb:
 		#BC 	main_verb = eval('story.' + str(part) + '.doc')[1]
-			if str(part) == 'means' or str.lower(eval('story.' + str(part) + '.doc')[1].text) == 'can':
-				main_verb = eval('story.' + str(part) + '.doc')[2]
+			if str(part) == 'means' or str.lower(doc[1].text) == 'can':
+				main_verb = doc[2]
 			else:
-				main_verb = eval('story.' + str(part) + '.doc')[1]
+				main_verb = doc[1]
 
 		# If the sentence contains no dobj it must be another obj
 		if not found_obj:
-			for token in eval('story.' + str(part) + '.doc'):
+			for token in doc:
 				if token.dep_[1:] == 'obj':
 					found_obj = True
 					main_object = token
@@ -287,9 +319,9 @@ class StoryMiner:
 				story.ends.main_verb.type = "II"
 
 		if type(main_object) is list or main_object == self.system.main:
-			story = eval('self.get_' + str(part) + '_phrases(story, ' + str(found_mv_phrase) + ', False)')
+			story = self.phrases[part](story, found_mv_phrase, False)
 		else:
-			story = eval('self.get_' + str(part) + '_phrases(story, ' + str(found_mv_phrase) + ')')
+			story = self.phrases[part](story, found_mv_phrase)
 
 		return story
 
@@ -335,7 +367,7 @@ class StoryMiner:
 				if story.ends.subject.main in np:
 					story.ends.subject.phrase = np
 		
-			if story.ends.subject.phrase:
+			if hasattr(story.ends.subject, 'phrase'):
 				for token in story.ends.subject.phrase:
 					if is_compound(token) and token.head == story.ends.subject.main:
 						story.ends.subject.compound = [token, story.ends.subject.main]
@@ -380,30 +412,30 @@ class StoryMiner:
 			self.get_ff_verbs(story)
 			self.get_ff_nouns(story)
 			if story.means.free_form:
-				story = _get(story, 'proper_nouns', 'get_proper_nouns', 'nouns')
-				story = _get(story, 'noun_phrases', 'get_noun_phrases', 'free_form')
-				story = _get(story, 'compounds', 'get_compound_nouns', 'free_form')
+				story = _get(story, 'proper_nouns', MinerUtility.get_proper_nouns, 'nouns')
+				story = _get(story, 'noun_phrases', MinerUtility.get_noun_phrases, 'free_form')
+				story = _get(story, 'compounds', MinerUtility.get_compound_nouns, 'free_form')
 			if story.has_ends:
-				story = _get(story, 'proper_nouns', 'get_proper_nouns', 'nouns', part='ends')
-				story = _get(story, 'noun_phrases', 'get_noun_phrases', 'free_form', part='ends')
-				story = _get(story, 'compounds', 'get_compound_nouns', 'free_form', part='ends')
+				story = _get(story, 'proper_nouns', MinerUtility.get_proper_nouns, 'nouns', part='ends')
+				story = _get(story, 'noun_phrases', MinerUtility.get_noun_phrases, 'free_form', part='ends')
+				story = _get(story, 'compounds', MinerUtility.get_compound_nouns, 'free_form', part='ends')
 
 		return story
 
 	def get_ff_subj_dobj(self, story, part='means'):
-		story = me_get(story, 'nouns', 'get_subj', 'free_form')
-		return me_get(story, 'nouns', 'get_dobj', 'free_form')
+		story = me_get(story, 'nouns', MinerUtility.get_subj, 'free_form')
+		return me_get(story, 'nouns', MinerUtility.get_dobj, 'free_form')
 
 	def get_ff_nouns(self, story):
-		return me_get(story, 'nouns', 'get_nouns', 'free_form')
+		return me_get(story, 'nouns', MinerUtility.get_nouns, 'free_form')
 
 	def get_ff_verbs(self, story):
-		story = me_get(story, 'verbs', 'get_verbs', 'free_form')
+		story = me_get(story, 'verbs', MinerUtility.get_verbs, 'free_form')
 		
 		if story.means.verbs:
-			story = _get(story, 'phrasal_verbs', 'get_phrasal_verbs', 'verbs')
+			story = _get(story, 'phrasal_verbs', MinerUtility.get_phrasal_verbs, 'verbs')
 		if story.has_ends and story.ends.verbs:
-			story = _get(story, 'phrasal_verbs', 'get_phrasal_verbs', 'verbs', part='ends')
+			story = _get(story, 'phrasal_verbs', MinerUtility.get_phrasal_verbs, 'verbs', part='ends')
 
 		return story
 
@@ -415,11 +447,8 @@ class MinerUtility:
 
 	# Fixes that spaCy dependencies are not spans, but temporary objects that get deleted when loaded into memory
 	def get_span(story, li, part='doc'):
-		ret = []
-		idxlist = get_idx(li)
-		for i in idxlist:
-			ret.append(eval('story.' + str(part))[i])
-		return ret
+		doc = DOCS[part](story)
+		return [doc[i] for i in get_idx(li)]
 
 	# Obtain noun phrases (including form 'x of y')
 	'''
@@ -456,8 +485,10 @@ class MinerUtility:
 		mobj_i = 1000
 		vtype = ""
 
+		doc = DOCS[part](story)
+
 		if part == 'means.doc' or part == 'ends.doc':
-			for token in eval('story.' + str(part)):
+			for token in doc:
 				if token.dep_ == 'dobj':
 					mobj_i = token.i
 					break
@@ -467,7 +498,7 @@ class MinerUtility:
 			phrase.append(phrasal_verb)
 			vtype = "II"
 		else:
-			for chunk in eval('story.' + str(part) + '.noun_chunks'):
+			for chunk in doc.noun_chunks:
 				for c in phrasal_verb.children:
 					if c == chunk.root.head and c.i < mobj_i:
 						if c.pos_ == 'PART':
@@ -545,7 +576,7 @@ class MinerUtility:
 	def get_noun_phrases(story, span, part='doc'):
 		phrases = []
 		
-		for chunk in eval('story.' + str(part) + '.noun_chunks'):
+		for chunk in DOCS[part](story).noun_chunks:
 			chunk = MinerUtility.get_span(story, chunk)
 			if is_sublist(chunk, span):
 				phrases.append(MinerUtility.get_span(story, chunk))
@@ -0,0 +1,43 @@
+DEFAULT_MODEL = "en_core_web_md"
+
+# Model packages by size
+MODELS = {
+	'sm': "en_core_web_sm",
+	'md': "en_core_web_md",
+	'lg': "en_core_web_lg",
+}
+
+# Pipeline components that set the POS tags, tags, dependencies, lemmas and noun chunks the miner reads
+NEEDED = ['tok2vec', 'tagger', 'parser', 'attribute_ruler', 'lemmatizer']
+
+def model_name(model):
+	"""Gets the package name of a model
+
+	:param model: A model size (sm, md or lg) or a model package name
+	:returns: Name of the model package
+	"""
+	return MODELS.get(model, model)
+
+def unused_components(name):
+	"""Gets the pipeline components of a model that the miner does not need
+
+	:param name: Name of the model package
+	:returns: List of component names
+	"""
+	import spacy
+	meta = spacy.util.get_model_meta(spacy.util.get_package_path(name))
+	components = meta.get('components', meta.get('pipeline', []))
+	return [c for c in components if c not in NEEDED]
+
+def load(model=DEFAULT_MODEL):
+	"""Loads a model with only the pipeline components the miner needs
+
+	Components such as the named entity recognizer are not loaded at all. Word vectors are still loaded
+	if the model has them, as its tok2vec layer uses them; the sm model has none and loads fastest.
+
+	:param model: A model size (sm, md or lg) or a model package name
+	:returns: Natural Language Processor (spaCy)
+	"""
+	import spacy
+	name = model_name(model)
+	return spacy.load(name, exclude=unused_components(name))
@@ -0,0 +1,174 @@
+import re
+
+from lang.owlprefix import PREFIX_DICT
+from storyminer.columnar import get_attr, get_path
+from storyminer.userstory import FailedUserStory
+from storyminer.utility import CaseMemo, is_noun
+
+SYNTAXES = ['turtle', 'manchester']
+EXTENSIONS = {'turtle': 'ttl', 'manchester': 'omn'}
+# Prefixes of PREFIX_DICT that the ontology uses
+PREFIXES = ['rdf', 'rdfs', 'xsd', 'owl']
+DEFAULT_IRI = "http://example.org/{}.owl#"
+
+class Turtle(object):
+	def header(self, iri, prefixes):
+		lines = ["@prefix : <{}> .".format(iri)]
+		lines += ["@prefix {}: <{}> .".format(p, PREFIX_DICT[p]) for p in prefixes]
+		return lines + ["", "<{}> a owl:Ontology .".format(iri.rstrip('#')), ""]
+
+	def declare(self, kind, name, label):
+		return [":{} a owl:{} ;".format(name, kind), "\trdfs:label {} .".format(_literal(label))]
+
+	def subclass(self, sub, sup):
+		return [":{} rdfs:subClassOf :{} .".format(sub, sup)]
+
+	def some(self, sub, prop, obj):
+		return [":{} rdfs:subClassOf [ a owl:Restriction ; owl:onProperty :{} ; owl:someValuesFrom :{} ] .".format(sub, prop, obj)]
+
+class Manchester(object):
+	# Frames of an entity can be repeated, so that axioms are written as they are found
+	def header(self, iri, prefixes):
+		lines = ["Prefix: : <{}>".format(iri)]
+		lines += ["Prefix: {}: <{}>".format(p, PREFIX_DICT[p]) for p in prefixes]
+		return lines + ["", "Ontology: <{}>".format(iri.rstrip('#')), ""]
+
+	def declare(self, kind, name, label):
+		return ["{}: {}".format(kind, name), "\tAnnotations: rdfs:label {}".format(_literal(label)), ""]
+
+	def subclass(self, sub, sup):
+		return ["Class: {}".format(sub), "\tSubClassOf: {}".format(sup), ""]
+
+	def some(self, sub, prop, obj):
+		return ["Class: {}".format(sub), "\tSubClassOf: {} some {}".format(prop, obj), ""]
+
+class OntologyWriter(object):
+	"""Writes the roles, objects, compounds and verb relations of mined user stories as an OWL ontology
+
+	Roles and main objects are classes, of which compounds are subclasses, and main verbs are object
+	properties from the role to the main object. Statements are written as each user story is added. Only
+	the names of the entities and axioms written so far are kept, to not write them again.
+	"""
+	def __init__(self, out, systemname, syntax='turtle', iri=None):
+		"""
+		:param out: Open LineWriter, see Writer.make_stream
+		:param systemname: System name, of which the ontology IRI is made
+		:param syntax: 'turtle' or 'manchester'
+		:param iri: Ontology IRI, by default DEFAULT_IRI with the system name
+		"""
+		self.out = out
+		self.name = out.name
+		self.syntax = Turtle() if syntax == 'turtle' else Manchester()
+		self.case = CaseMemo()
+		self.seen = set()
+		self.classes = 0
+		self.properties = 0
+		self.axioms = 0
+		self.write(self.syntax.header(iri or DEFAULT_IRI.format(_name(str(systemname)).lower()), PREFIXES))
+
+	def add(self, story):
+		"""Writes the entities and axioms of a mined user story that were not written yet; failed user stories are skipped
+
+		:param story: UserStory
+		"""
+		if type(story) is FailedUserStory or get_attr(story, 'error') is not None:
+			return
+		role = self.concept(get_path(story, 'role.functional_role'))
+		if not role:
+			return
+		self.relation(role, get_path(story, 'means.main_verb'), self.concept(get_path(story, 'means.main_object')))
+		if get_attr(story, 'has_ends'):
+			subject = get_path(story, 'ends.subject.main')
+			# The ends is about the role, unless it names another subject
+			if subject is not None and type(subject) is not list and is_noun(subject):
+				subject = self.entity('Class', self.case(subject))
+			else:
+				subject = role
+			self.relation(subject, get_path(story, 'ends.main_verb'), self.concept(get_path(story, 'ends.main_object')))
+
+	def concept(self, main):
+		"""Writes the class of a main part and of its compound, which is a subclass of it
+
+		:param main: WithMain of a functional role or main object
+		:returns: Name of the class of the compound if there is one, otherwise of the main part, or None
+		"""
+		if main is None:
+			return None
+		name = self.entity('Class', self.case(get_attr(main, 'main')))
+		compound = self.entity('Class', self.case(get_attr(main, 'compound')))
+		if name and compound and compound != name:
+			self.axiom('subclass', compound, name)
+			return compound
+		return name
+
+	def relation(self, subject, verb, obj):
+		if not (subject and verb and obj):
+			return
+		prop = self.entity('ObjectProperty', _verb(verb))
+		if prop:
+			self.axiom('some', subject, prop, obj)
+
+	def entity(self, kind, label):
+		"""Writes the declaration of a class or object property, if it was not written yet
+
+		:param kind: 'Class' or 'ObjectProperty'
+		:param label: Text of the entity
+		:returns: Name of the entity, or None if the label has no name
+		"""
+		if not label:
+			return None
+		name = _name(label) if kind == 'Class' else _property(label)
+		if not name:
+			return None
+		key = (kind, name)
+		if key not in self.seen:
+			self.seen.add(key)
+			if kind == 'Class':
+				self.classes += 1
+			else:
+				self.properties += 1
+			self.write(self.syntax.declare(kind, name, label))
+		return name
+
+	def axiom(self, kind, *names):
+		key = (kind,) + names
+		if key not in self.seen:
+			self.seen.add(key)
+			self.axioms += 1
+			self.write(getattr(self.syntax, kind)(*names))
+
+	def write(self, lines):
+		for line in lines:
+			self.out.write(line)
+
+	def close(self):
+		self.out.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+def _verb(verb):
+	# Phrasal verbs, such as 'log in', are named by all of their words
+	words = get_attr(verb, 'phrase') if get_attr(verb, 'type') else None
+	words = words or [get_attr(verb, 'main')]
+	return " ".join(w for w in (_lemma(t) for t in words) if w)
+
+def _lemma(t):
+	if t is None or type(t) is list:
+		return None
+	if type(t) is str:
+		return t.lower()
+	return getattr(t, 'lemma_', t.text).lower()
+
+def _name(text):
+	return "".join(w[:1].upper() + w[1:] for w in re.split(r"\W+", text) if w)
+
+def _property(text):
+	name = _name(text)
+	return name[:1].lower() + name[1:]
+
+def _literal(text):
+	return '"{}"'.format(text.replace('\\', '\\\\').replace('"', '\\"'))
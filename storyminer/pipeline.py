@@ -0,0 +1,441 @@
+import copy
+from collections import deque
+from itertools import islice
+
+from storyminer.compact import compact
+from storyminer.docstore import DOC_ATTRS
+from storyminer.userstory import UserStory, FailedUserStory
+from storyminer.utility import remove_punct
+
+DEFAULT_BATCH_SIZE = 1000
+BUCKETS = 8
+
+# Retention policies for the docs of mined user stories
+KEEP_DOCS = ['all', 'parts', 'none']
+# Token attributes that span_doc copies, besides the words and their whitespace
+SPAN_ATTRS = [attr for attr in DOC_ATTRS if attr not in ('ORTH', 'SPACY')]
+
+def normalize(text):
+	"""Prepares a user story text for NLP
+
+	:param text: The user story text
+	:returns: Text without punctuation and double whitespace
+	"""
+	return ' '.join(remove_punct(text).split())
+
+def parse(text, id, nlp, miner):
+	"""Create a new user story object and mines it to map all data in the user story text to a predefined model
+
+	:param text: The user story text
+	:param id: The user story ID, which can later be used to identify the user story
+	:param nlp: Natural Language Processor (spaCy)
+	:param miner: instance of class Miner
+	:returns: A new user story object
+	"""
+	timer = miner.instrument
+
+	# Prepare for NLP
+	with timer.time('normalize', id):
+		no_double_space = normalize(text)
+
+	# Create user story object
+	user_story = UserStory(id, text.rstrip(), no_double_space)
+	with timer.time('parse', id):
+		user_story.doc = nlp(no_double_space)
+
+	# Mine user story, as StoryMiner.mine does
+	with timer.time('structure', id):
+		miner.structure(user_story)
+		miner.get_part_text(user_story)
+	user_story.old_doc = user_story.doc
+	with timer.time('parse', id):
+		user_story.doc = nlp(user_story.sentence)
+		miner.nlp_part(user_story, nlp)
+	with timer.time('mine', id):
+		miner.extract(user_story)
+	return user_story
+
+def parse_single(text, id, nlp, miner):
+	"""Create a new user story object and mines it with a single parse
+
+	The role, means and ends docs are copied from spans of one parsed text, instead of being parsed separately.
+	The story doc is parsed from the sentence, in the same nlp.pipe call, as the miner reads its tokens too.
+
+	:param text: The user story text
+	:param id: The user story ID, which can later be used to identify the user story
+	:param nlp: Natural Language Processor (spaCy)
+	:param miner: instance of class Miner
+	:returns: A new user story object
+	"""
+	timer = miner.instrument
+	with timer.time('normalize', id):
+		user_story = UserStory(id, text.rstrip(), normalize(text))
+	with timer.time('structure', id):
+		single_text, offsets = structure_single(user_story, miner)
+	with timer.time('parse', id):
+		sentence_doc, doc = nlp.pipe([user_story.sentence, single_text])
+	split_single(user_story, sentence_doc, doc, offsets, nlp, miner)
+	with timer.time('mine', id):
+		miner.extract(user_story)
+	return user_story
+
+def structure_single(story, miner, indicators=None):
+	"""Structures a user story without parsing it, and joins its parts into the text to parse
+
+	The means and ends are joined in their simplified form, so that spans of the parsed text align
+	with the texts that StoryMiner.nlp_part would parse.
+
+	:param story: A new user story
+	:param miner: instance of class Miner
+	:param indicators: Indicators found by IndicatorMatcher.match_all, or None to find them here
+	:returns: Text to parse and list of (part, start, end) character offsets of the parts in that text
+	"""
+	miner.get_indicators(story, indicators)
+	miner.check_indicators(story)
+	miner.get_part_text(story)
+
+	text = ''
+	offsets = []
+	for part, t in part_texts(story):
+		if part is story.role:
+			text += story.sentence[part.indicator_i:part.indicator_i + len(part.indicator)] + ' '
+		elif part is not story.means:
+			text += story.sentence[part.indicator_i + 1:part.indicator_i + len(part.indicator) + 1] + ' '
+		offsets.append((part, len(text), len(text) + len(t)))
+		text += t + ' '
+	return text.rstrip(), offsets
+
+def split_single(story, sentence_doc, doc, offsets, nlp, miner):
+	"""Sets the story doc and copies the role, means and ends docs from spans of the parsed parts
+
+	:param story: A user story after structure_single
+	:param sentence_doc: The parsed sentence of the user story
+	:param doc: The parsed text of structure_single
+	:param offsets: Character offsets of the parts, as returned by structure_single
+	:param nlp: Natural Language Processor (spaCy), used for parts that do not align with token boundaries
+	:param miner: instance of class Miner
+	"""
+	story.doc = sentence_doc
+	story.old_doc = sentence_doc
+	miner.get_I(story)
+	for part, start, end in offsets:
+		span = doc.char_span(start, end)
+		if span is None or not len(span):
+			part.doc = nlp(doc.text[start:end])
+		else:
+			part.doc = span_doc(span)
+
+def span_doc(span):
+	"""Copies a span to a doc of its own, like Span.as_doc, without the whitespace after its last token
+
+	:param span: A spaCy span
+	:returns: A spaCy doc with the text of the span, as it would be if parsed separately
+	"""
+	doc = span.as_doc()
+	if not doc[-1].whitespace_:
+		return doc
+	from spacy.tokens import Doc
+	spaces = [bool(t.whitespace_) for t in doc]
+	spaces[-1] = False
+	stripped = Doc(doc.vocab, words=[t.text for t in doc], spaces=spaces)
+	return stripped.from_array(SPAN_ATTRS, doc.to_array(SPAN_ATTRS))
+
+def mine(stories, nlp, miner, single_parse=False):
+	"""Mines user stories one at a time
+
+	:param stories: Iterable of (ID, text) pairs
+	:param nlp: Natural Language Processor (spaCy)
+	:param miner: instance of class Miner
+	:param single_parse: Parse the parts of each user story at once, see parse_single
+	:returns: Generator of UserStory and FailedUserStory objects, in input order
+	"""
+	parser = parse_single if single_parse else parse
+	for id, text in stories:
+		# Stages that run more than once per user story, such as parse, are recorded as one timing
+		with miner.instrument.stories([id]):
+			try:
+				us = parser(text, id, nlp, miner)
+			except ValueError as e:
+				us = FailedUserStory(id, text, str(e.args[0]))
+		yield us
+
+def pipe(nlp, texts, batch_size=DEFAULT_BATCH_SIZE):
+	"""Parses texts with nlp.pipe, batching texts of similar length together
+
+	:param nlp: Natural Language Processor (spaCy)
+	:param texts: List of texts
+	:param batch_size: Number of texts per nlp.pipe batch
+	:returns: List of docs, in the order of texts
+	"""
+	order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+	docs = [None] * len(texts)
+	for i, doc in zip(order, nlp.pipe((texts[i] for i in order), batch_size=batch_size)):
+		docs[i] = doc
+	return docs
+
+def pipe_parts(nlp, texts, miner, batch_size=DEFAULT_BATCH_SIZE):
+	"""Parses role, means and ends texts with pipe, except those in the part cache of the miner
+
+	:param nlp: Natural Language Processor (spaCy)
+	:param texts: List of texts
+	:param miner: instance of class Miner
+	:param batch_size: Number of texts per nlp.pipe batch
+	:returns: List of docs, in the order of texts
+	"""
+	cache = miner.part_cache
+	docs = [cache.get(text) for text in texts]
+	# Texts that are repeated within the window are parsed once too
+	missing = list(dict.fromkeys(text for text, doc in zip(texts, docs) if doc is None))
+	parsed = dict(zip(missing, pipe(nlp, missing, batch_size)))
+	for text, doc in parsed.items():
+		cache.put(text, doc)
+	repeated = sum(1 for doc in docs if doc is None) - len(missing)
+	cache.hits += repeated
+	cache.misses -= repeated
+	return [doc if doc is not None else parsed[text] for text, doc in zip(texts, docs)]
+
+def part_texts(story):
+	"""Lists the parts of a structured user story that need to be parsed
+
+	:param story: A user story after StoryMiner.get_part_text
+	:returns: List of (part, text) pairs
+	"""
+	parts = [(story.role, story.role.t), (story.means, story.means.simplified)]
+	if story.has_ends:
+		parts.append((story.ends, story.ends.simplified))
+	return parts
+
+def mine_batch(stories, nlp, miner, batch_size=DEFAULT_BATCH_SIZE, single_parse=False):
+	"""Mines user stories with batched nlp.pipe calls
+
+	Stories are read in windows of several batches. Within a window, texts are sorted by length
+	before batching so that a single long line does not stall a batch of short ones.
+
+	:param stories: Iterable of (ID, text) pairs
+	:param nlp: Natural Language Processor (spaCy)
+	:param miner: instance of class Miner
+	:param batch_size: Number of texts per nlp.pipe batch
+	:param single_parse: Parse the parts of each user story at once, see parse_single
+	:returns: Generator of UserStory and FailedUserStory objects, in input order
+	"""
+	mine_window = _mine_window_single if single_parse else _mine_window
+	stories = iter(stories)
+	while True:
+		window = list(islice(stories, batch_size * BUCKETS))
+		if not window:
+			break
+		with miner.instrument.stories([id for id, _ in window]):
+			results = mine_window(window, nlp, miner, batch_size)
+		yield from results
+
+def _mine_window(window, nlp, miner, batch_size):
+	# Stages that run on the whole window are timed as a batch, the others per user story
+	timer = miner.instrument
+	ids = [id for id, _ in window]
+	results = []
+	with timer.time_batch('normalize', ids):
+		for id, text in window:
+			results.append(UserStory(id, text.rstrip(), normalize(text)))
+
+	# Parse and structure the full sentences
+	sentences = [us.sentence for us in results]
+	with timer.time_batch('structure', ids):
+		indicators = miner.matcher.match_all(sentences)
+	with timer.time_batch('parse', ids):
+		docs = pipe(nlp, sentences, batch_size)
+	parts = []
+	for i, (us, doc) in enumerate(zip(results, docs)):
+		us.doc = doc
+		with timer.time('structure', us.id):
+			try:
+				miner.structure(us, indicators[i])
+			except ValueError as e:
+				results[i] = FailedUserStory(us.id, window[i][1], str(e.args[0]))
+				continue
+			us.old_doc = us.doc
+			miner.get_part_text(us)
+		parts.extend(part_texts(us))
+
+	# Parse the role, means and ends of all structured stories at once
+	with timer.time_batch('parse', [us.id for us in results if type(us) is not FailedUserStory]):
+		docs = pipe_parts(nlp, [t for _, t in parts], miner, batch_size)
+	for (part, _), doc in zip(parts, docs):
+		part.doc = doc
+
+	for i, us in enumerate(results):
+		if type(us) is FailedUserStory:
+			continue
+		with timer.time('mine', us.id):
+			try:
+				miner.extract(us)
+			except ValueError as e:
+				results[i] = FailedUserStory(us.id, window[i][1], str(e.args[0]))
+
+	return results
+
+def _mine_window_single(window, nlp, miner, batch_size):
+	timer = miner.instrument
+	ids = [id for id, _ in window]
+	with timer.time_batch('normalize', ids):
+		results = [UserStory(id, text.rstrip(), normalize(text)) for id, text in window]
+	with timer.time_batch('structure', ids):
+		indicators = miner.matcher.match_all([us.sentence for us in results])
+	texts = []
+	for i, us in enumerate(results):
+		with timer.time('structure', us.id):
+			try:
+				texts.append(structure_single(us, miner, indicators[i]))
+			except ValueError as e:
+				results[i] = FailedUserStory(us.id, window[i][1], str(e.args[0]))
+
+	structured = [us for us in results if type(us) is not FailedUserStory]
+	with timer.time_batch('parse', [us.id for us in structured]):
+		docs = pipe(nlp, [us.sentence for us in structured] + [t for t, _ in texts], batch_size)
+	docs = iter(zip(docs[:len(structured)], docs[len(structured):]))
+	texts = iter(texts)
+	for i, us in enumerate(results):
+		if type(us) is FailedUserStory:
+			continue
+		split_single(us, *next(docs), next(texts)[1], nlp, miner)
+		with timer.time('mine', us.id):
+			try:
+				miner.extract(us)
+			except ValueError as e:
+				results[i] = FailedUserStory(us.id, window[i][1], str(e.args[0]))
+
+	return results
+
+class Duplicates(object):
+	"""Number of user stories and of unique normalized texts of a deduplicated run"""
+	def __init__(self):
+		self.stories = 0
+		self.unique = 0
+
+	def ratio(self):
+		"""Share of the user stories that were copies of an earlier one"""
+		return (self.stories - self.unique) / self.stories if self.stories else 0.0
+
+def dedupe(stories, mine, duplicates=None, keep_docs='all'):
+	"""Mines every normalized text once, and copies the result to the other user stories with that text
+
+	Copies keep their own ID and text, so they export as if they were mined themselves. Of the first user story
+	with a normalized text only its compact form (see storyminer.compact), or its failure code, is kept until the
+	end of the run, as later user stories may be copies of it. That form keeps the docs that keep_docs retains.
+
+	:param stories: Iterable of (ID, text) pairs
+	:param mine: Function that mines an iterable of (ID, text) pairs, and yields the results in the same order
+	:param duplicates: Optional Duplicates, counted as the user stories are read
+	:param keep_docs: Retention policy for the docs of the mined user stories, see retain
+	:returns: Generator of mined user stories and their copies, in input order
+	"""
+	if duplicates is None:
+		duplicates = Duplicates()
+	# Per normalized text a list that gets the result, and per input user story its list and, if it is a copy, its (ID, text)
+	firsts = {}
+	order = deque()
+
+	def unique():
+		for id, text in stories:
+			duplicates.stories += 1
+			key = normalize(text)
+			if key in firsts:
+				order.append((firsts[key], (id, text)))
+				continue
+			duplicates.unique += 1
+			firsts[key] = []
+			order.append((firsts[key], None))
+			yield id, text
+
+	for us in mine(unique()):
+		while order[0][1] is not None:
+			yield duplicate(*order.popleft())
+		first = order.popleft()[0]
+		yield us
+		# Compacted after it was yielded, as compacting sets the texts of its parts
+		first.append(us.error if type(us) is FailedUserStory else compact(us, keep_docs=kept_docs(keep_docs)))
+	while order:
+		yield duplicate(*order.popleft())
+
+def duplicate(first, story):
+	"""Copies a mined user story for a user story with the same normalized text
+
+	:param first: List with the compact mined user story, or its failure code
+	:param story: (ID, text) pair of the copy
+	:returns: The copy
+	"""
+	id, text = story
+	if type(first[0]) is str:
+		return FailedUserStory(id, text, first[0])
+	us = copy.copy(first[0])
+	us.id = id
+	us.text = text.rstrip()
+	return us
+
+def retain(results, keep_docs='all'):
+	"""Releases the docs of mined user stories that a retention policy does not keep
+
+	:param results: Iterable of mined user stories
+	:param keep_docs: 'all' keeps the user stories as they are. Otherwise they are turned into compact stories
+		(see storyminer.compact) that keep the bytes of only the role, means and ends docs ('parts'), or no docs ('none')
+	:returns: Iterable of user stories, in the same order
+	"""
+	if keep_docs == 'all':
+		return results
+	return (release(us, keep_docs) for us in results)
+
+def release(story, keep_docs):
+	"""Releases the docs of a mined user story, see retain
+
+	:returns: The compact form of the user story
+	"""
+	return compact(story, keep_docs=kept_docs(keep_docs))
+
+def kept_docs(keep_docs):
+	"""
+	:param keep_docs: Retention policy, one of KEEP_DOCS
+	:returns: The keep_docs argument of compact that keeps the docs the policy retains
+	"""
+	if keep_docs == 'all':
+		return True
+	return 'parts' if keep_docs == 'parts' else False
+
+COMPARED_FIELDS = ['error', 'doc', 'iloc', 'role.doc', 'means.doc', 'ends.doc',
+	'role.functional_role.main', 'role.functional_role.compound',
+	'means.main_verb.main', 'means.main_verb.type', 'means.main_object.main', 'means.main_object.compound', 'means.free_form',
+	'ends.main_verb.main', 'ends.main_object.main', 'ends.free_form', 'means.nouns', 'means.compounds']
+
+def compare_single(stories, nlp, miner):
+	"""Mines user stories with both parse and parse_single, and counts how often their extracted fields differ
+
+	:param stories: Iterable of (ID, text) pairs
+	:param nlp: Natural Language Processor (spaCy)
+	:param miner: instance of class Miner
+	:returns: Dictionary with the number of stories, differing stories, differences per field and differing IDs
+	"""
+	report = {'stories': 0, 'differing': 0, 'fields': dict.fromkeys(COMPARED_FIELDS, 0), 'ids': []}
+	for id, text in stories:
+		multi = next(mine([(id, text)], nlp, miner))
+		single = next(mine([(id, text)], nlp, miner, single_parse=True))
+		report['stories'] += 1
+		differs = False
+		for field in COMPARED_FIELDS:
+			if _field(multi, field) != _field(single, field):
+				report['fields'][field] += 1
+				differs = True
+		if differs:
+			report['differing'] += 1
+			report['ids'].append(id)
+	return report
+
+def _field(story, field):
+	o = story
+	for attr in field.split('.'):
+		o = getattr(o, attr, None)
+	return _text(o)
+
+def _text(o):
+	if o is None:
+		return None
+	if type(o) is list:
+		return [_text(x) for x in o]
+	return str(o)
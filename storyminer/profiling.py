@@ -0,0 +1,234 @@
+import cProfile
+import functools
+import io
+import json
+import pstats
+import timeit
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+# Methods of StoryMiner that are profiled as a phase; export is profiled where the output is created
+MINER_PHASES = ['structure', 'get_functional_role', 'get_mobj_and_mv', 'get_free_form']
+# Functions of storyminer.pipeline that are profiled as a phase, as single-parse mining does not call StoryMiner.structure
+PIPELINE_PHASES = {'structure': 'structure_single'}
+PHASES = MINER_PHASES + ['export']
+DEFAULT_TOP = 10
+# Number of frames kept per allocation, enough to find the phase of the allocations that the miner and export
+# make themselves; allocations deeper down are reported by the phase only if it is within these frames
+FRAMES = 8
+
+class Phase(object):
+	def __init__(self):
+		self.calls = 0
+		self.seconds = 0.0
+		self.allocated = 0
+		self.peak = 0
+		self.sites = Counter()
+
+class Profiler(object):
+	"""Profiles mining with cProfile, and measures the memory allocated per phase with tracemalloc
+
+	Profiling is on within `with profiler:` blocks only, so that a sample of the user stories can be profiled.
+	The allocations that are still there at the end of such a block are reported by the phase that made them.
+	"""
+	def __init__(self, top=DEFAULT_TOP):
+		"""
+		:param top: Number of allocation sites to report per phase
+		"""
+		self.top = top
+		self.profile = cProfile.Profile()
+		self.phases = {name: Phase() for name in PHASES}
+		self.active = False
+		self.sampled = 0
+		# One in every this many user stories is sampled, and the IDs of those, see export
+		self.every = 1
+		self.ids = set()
+		# Lines of the code of each phase, as (file name, first line, last line)
+		self.code = {'export': [_lines(f.__code__) for f in _export_functions()]}
+
+	def __enter__(self):
+		tracemalloc.start(FRAMES)
+		self.profile.enable()
+		self.active = True
+		return self
+
+	def __exit__(self, *exc):
+		self.profile.disable()
+		self.collect(tracemalloc.take_snapshot())
+		tracemalloc.stop()
+		self.active = False
+
+	def watch(self, miner):
+		"""Profiles the phases of a StoryMiner
+
+		:param miner: instance of class Miner, of which the methods in MINER_PHASES are wrapped. The functions in
+			PIPELINE_PHASES are wrapped too, and count as profiled only while profiling is on
+		"""
+		from storyminer import pipeline
+		for name in MINER_PHASES:
+			method = getattr(miner, name)
+			self.code[name] = [_lines(method.__code__)]
+			setattr(miner, name, self.wrap(name, method))
+		for name, function in PIPELINE_PHASES.items():
+			# Wrapped once, by the last profiler that watches
+			function = getattr(pipeline, function)
+			function = getattr(function, '__wrapped__', function)
+			self.code[name].append(_lines(function.__code__))
+			setattr(pipeline, PIPELINE_PHASES[name], self.wrap(name, function))
+
+	def wrap(self, name, method):
+		@functools.wraps(method)
+		def phase(*args, **kwargs):
+			with self.phase(name):
+				return method(*args, **kwargs)
+		return phase
+
+	@contextmanager
+	def phase(self, name):
+		"""Measures the time and memory of a phase, if profiling is on
+
+		:param name: One of PHASES
+		"""
+		if not self.active:
+			yield
+			return
+		size = tracemalloc.get_traced_memory()[0]
+		tracemalloc.reset_peak()
+		start = timeit.default_timer()
+		try:
+			yield
+		finally:
+			seconds = timeit.default_timer() - start
+			current, peak = tracemalloc.get_traced_memory()
+			p = self.phases[name]
+			p.calls += 1
+			p.seconds += seconds
+			p.allocated += current - size
+			p.peak = max(p.peak, peak - size)
+
+	def collect(self, snapshot):
+		"""Adds the allocations of a snapshot to the sites of the phases they were made in
+
+		An allocation belongs to the innermost phase in its traceback, and its site is the line that made it.
+		"""
+		for stat in snapshot.statistics('traceback'):
+			frames = stat.traceback
+			for frame in reversed(frames):
+				phase = self.phase_of(frame)
+				if phase:
+					site = frames[-1]
+					self.phases[phase].sites["{}:{}".format(site.filename, site.lineno)] += stat.size
+					break
+
+	def phase_of(self, frame):
+		for name, ranges in self.code.items():
+			for filename, first, last in ranges:
+				if frame.filename == filename and first <= frame.lineno <= last:
+					return name
+		return None
+
+	@contextmanager
+	def profiling(self, name):
+		"""Profiles a phase, turning profiling on for it if it is not on already, such as for the export of a whole set
+
+		:param name: One of PHASES
+		"""
+		if self.active:
+			with self.phase(name):
+				yield
+		else:
+			with self, self.phase(name):
+				yield
+
+	def mine(self, stories, mine, every=1):
+		"""Mines user stories, profiling one in every user stories
+
+		Sampled user stories are mined on their own, and the ones in between as a group, so that batching
+		still applies to them.
+
+		:param stories: Iterable of (ID, text) pairs
+		:param mine: Function that mines an iterable of (ID, text) pairs, such as storyminer.pipeline.mine
+		:param every: Profile one in this many user stories
+		:returns: Generator of mined user stories, in input order
+		"""
+		self.every = every
+		if every <= 1:
+			with self:
+				for us in mine(stories):
+					self.sampled += 1
+					yield us
+			return
+		group = []
+		for n, story in enumerate(stories):
+			if n % every:
+				group.append(story)
+				continue
+			if group:
+				yield from mine(group)
+				group = []
+			# Profiling stays on while the consumer handles the user story, so that its export is profiled too
+			with self:
+				self.sampled += 1
+				self.ids.add(story[0])
+				yield from mine([story])
+		if group:
+			yield from mine(group)
+
+	def export(self, stories):
+		"""Profiles the export of the sampled user stories of a set, each on its own
+
+		The export of the whole set is only profiled if every user story was sampled; otherwise the sampled
+		user stories are exported once more, as ndjson lines that are not written, to profile their export.
+
+		:param stories: Mined user stories of the set, including those that were not sampled
+		:returns: Context manager to export the whole set in
+		"""
+		if self.every <= 1:
+			return self.profiling('export')
+		if self.ids:
+			with self:
+				for us in stories:
+					if us.id in self.ids:
+						with self.phase('export'):
+							us.toJSON()
+		return nullcontext()
+
+	def report(self):
+		"""
+		:returns: Dictionary with the calls, time and memory per phase, and the top allocation sites of each phase
+		"""
+		phases = {}
+		for name, p in self.phases.items():
+			phases[name] = {'calls': p.calls, 'seconds': p.seconds, 'allocated': p.allocated, 'peak': p.peak,
+				'sites': [{'line': line, 'bytes': size} for line, size in p.sites.most_common(self.top)]}
+		return {'sampled': self.sampled, 'phases': phases}
+
+	def functions(self, top=DEFAULT_TOP, sort='cumulative'):
+		"""
+		:returns: Text of the top functions of the cProfile statistics
+		"""
+		out = io.StringIO()
+		pstats.Stats(self.profile, stream=out).sort_stats(sort).print_stats(top)
+		return out.getvalue()
+
+	def write(self, basename):
+		"""Writes the cProfile statistics and the allocation report
+
+		:param basename: Name and location of the files, without extension
+		:returns: Names of the .pstats file and of the .allocations.json file
+		"""
+		self.profile.dump_stats(basename + ".pstats")
+		with open(basename + ".allocations.json", 'w') as f:
+			json.dump(self.report(), f, indent=4)
+		return basename + ".pstats", basename + ".allocations.json"
+
+def _lines(code):
+	lines = [line for _, _, line in code.co_lines() if line]
+	return code.co_filename, min(lines), max(lines)
+
+def _export_functions():
+	from storyminer.compact import CompactStory
+	from storyminer.incremental import CarriedUserStory
+	from storyminer.userstory import UserStorySet, UserStory, FailedUserStory
+	return [UserStorySet.toJSON, UserStory.toJSON, FailedUserStory.toJSON, CompactStory.toJSON, CarriedUserStory.toJSON]
@@ -0,0 +1,230 @@
+import copy
+import json
+import os
+import queue
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import timeit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from storyminer.cache import LRUCache
+from storyminer.client import DEFAULT_ADDRESS, parse_address
+from storyminer.nlp import load, model_name, DEFAULT_MODEL
+from storyminer.pipeline import mine_batch, DEFAULT_BATCH_SIZE
+
+# Time a batch waits for more requests before it is mined, in seconds
+DEFAULT_MAX_WAIT = 0.01
+# Number of system names of which the user story set and miner are kept
+DEFAULT_MAX_SYSTEMS = 32
+
+class Request(object):
+	def __init__(self, stories, systemname):
+		self.stories = stories
+		self.systemname = systemname
+		self.result = None
+		self.error = None
+		self.done = threading.Event()
+
+class Batcher(object):
+	"""Mines the user stories of concurrent requests together in a single thread
+
+	Requests that arrive within max_wait of each other share nlp.pipe batches. The model is only
+	used from the mining thread, which also creates the JSON of each request.
+	"""
+	def __init__(self, nlp, batch_size=DEFAULT_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT, max_systems=DEFAULT_MAX_SYSTEMS):
+		"""
+		:param nlp: Natural Language Processor (spaCy)
+		:param batch_size: Number of texts per nlp.pipe batch
+		:param max_wait: Time a batch waits for more requests, in seconds
+		:param max_systems: Number of system names of which the user story set and miner are kept, least recently
+			used first out, so that clients cannot grow the server without limit
+		"""
+		self.nlp = nlp
+		self.batch_size = batch_size
+		self.max_wait = max_wait
+		self.systems = LRUCache(max_systems)
+		self.queue = queue.Queue()
+		self.mined = 0
+		self.thread = threading.Thread(target=self.run, daemon=True)
+		self.thread.start()
+
+	def mine(self, stories, systemname):
+		"""Mines user stories, waiting for the batch they are in
+
+		:param stories: List of (ID, text) pairs
+		:param systemname: System name, as passed to UserStorySet
+		:returns: JSON text, as produced by UserStorySet.toJSON
+		"""
+		request = Request(stories, systemname)
+		self.queue.put(request)
+		request.done.wait()
+		if request.error is not None:
+			raise request.error
+		return request.result
+
+	def run(self):
+		while True:
+			requests = [self.queue.get()]
+			size = len(requests[0].stories)
+			deadline = timeit.default_timer() + self.max_wait
+			while size < self.batch_size:
+				try:
+					request = self.queue.get(timeout=max(0, deadline - timeit.default_timer()))
+				except queue.Empty:
+					break
+				requests.append(request)
+				size += len(request.stories)
+
+			groups = {}
+			for request in requests:
+				groups.setdefault(request.systemname, []).append(request)
+			for systemname, group in groups.items():
+				try:
+					self.mine_group(systemname, group)
+				except Exception as e:
+					for request in group:
+						request.error = e
+				for request in group:
+					request.done.set()
+
+	def system(self, systemname):
+		# The user story set and miner of a system name are made once, and copied for every request
+		system = self.systems.get(systemname)
+		if system is None:
+			from storyminer.miner import StoryMiner
+			from storyminer.userstory import UserStorySet
+			template = UserStorySet(self.nlp, systemname)
+			system = (template, StoryMiner(template.system))
+			self.systems.put(systemname, system)
+		return system
+
+	def mine_group(self, systemname, requests):
+		template, miner = self.system(systemname)
+		stories = [story for request in requests for story in request.stories]
+		results = iter(list(mine_batch(stories, self.nlp, miner, self.batch_size)))
+		for request in requests:
+			user_stories = copy.copy(template)
+			user_stories.set = [next(results) for _ in request.stories]
+			request.result = user_stories.toJSON()
+		self.mined += len(stories)
+
+class Handler(BaseHTTPRequestHandler):
+	def do_GET(self):
+		if self.path == "/health":
+			self.respond(200, json.dumps({'model': self.server.model, 'mined': self.server.batcher.mined}))
+		else:
+			self.respond(404, json.dumps({'error': "Not found"}))
+
+	def do_POST(self):
+		if self.path != "/mine":
+			return self.respond(404, json.dumps({'error': "Not found"}))
+		try:
+			body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8'))
+			stories = read_stories(body)
+			if body.get('model') and model_name(body['model']) != self.server.model:
+				raise ValueError("Server runs model {}, not {}".format(self.server.model, model_name(body['model'])))
+		except (ValueError, KeyError, TypeError) as e:
+			return self.respond(400, json.dumps({'error': str(e)}))
+		try:
+			result = self.server.batcher.mine(stories, str(body.get('system') or "System"))
+		except Exception as e:
+			return self.respond(500, json.dumps({'error': str(e)}))
+		self.respond(200, result)
+
+	def respond(self, status, text):
+		data = text.encode('utf-8')
+		self.send_response(status)
+		self.send_header("Content-Type", "application/json; charset=utf-8")
+		self.send_header("Content-Length", str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+
+	def address_string(self):
+		# Clients of a Unix socket have no address
+		return self.client_address[0] if self.client_address else "unix"
+
+	def log_message(self, format, *args):
+		if self.server.verbose:
+			super().log_message(format, *args)
+
+def read_stories(body):
+	"""Reads the user stories of a mining request
+
+	:param body: Decoded JSON body, with either "story" (a text) or "stories" (a list of texts or of objects with "id" and "text")
+	:returns: List of (ID, text) pairs, numbered from 1 if no IDs are given
+	"""
+	if 'story' in body:
+		stories = [body['story']]
+	else:
+		stories = body['stories']
+	if not isinstance(stories, list):
+		raise ValueError("Expected a list of stories")
+	pairs = []
+	for i, story in enumerate(stories, 1):
+		if isinstance(story, dict):
+			pairs.append((story.get('id', i), str(story['text'])))
+		else:
+			pairs.append((i, str(story)))
+	return pairs
+
+class UnixHTTPServer(ThreadingHTTPServer):
+	address_family = socket.AF_UNIX
+
+	def server_bind(self):
+		socketserver.TCPServer.server_bind(self)
+		self.server_name = "localhost"
+		self.server_port = 0
+
+def make_server(address, nlp, model, batch_size=DEFAULT_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT, verbose=False, max_systems=DEFAULT_MAX_SYSTEMS):
+	"""Creates a mining server
+
+	:param address: Address to listen on, see storyminer.client.parse_address
+	:param nlp: Natural Language Processor (spaCy)
+	:param model: Package name of the model of nlp, which clients can ask for
+	:param batch_size: Number of texts per nlp.pipe batch
+	:param max_wait: Time a batch waits for more requests, in seconds
+	:param verbose: Log every request
+	:param max_systems: Number of system names of which the user story set and miner are kept, see Batcher
+	:returns: The HTTP server
+	"""
+	family, address = parse_address(address)
+	if family == socket.AF_UNIX:
+		if os.path.exists(address):
+			os.remove(address)
+		server = UnixHTTPServer(address, Handler)
+	else:
+		server = ThreadingHTTPServer(address, Handler)
+	server.daemon_threads = True
+	server.batcher = Batcher(nlp, batch_size, max_wait, max_systems)
+	server.model = model
+	server.verbose = verbose
+	return server
+
+def serve(address=DEFAULT_ADDRESS, model=DEFAULT_MODEL, batch_size=DEFAULT_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT, verbose=False,
+		max_systems=DEFAULT_MAX_SYSTEMS):
+	"""Loads a model once and serves mining requests until interrupted
+
+	:param address: Address to listen on, see storyminer.client.parse_address
+	:param model: spaCy model, by size (sm, md or lg) or package name
+	:param batch_size: Number of texts per nlp.pipe batch
+	:param max_wait: Time a batch waits for more requests, in seconds
+	:param verbose: Log every request
+	:param max_systems: Number of system names of which the user story set and miner are kept, see Batcher
+	"""
+	start = timeit.default_timer()
+	nlp = load(model)
+	server = make_server(address, nlp, model_name(model), batch_size, max_wait, verbose, max_systems)
+	print("Serving {} on {} (loaded in {:.2f}s)".format(model_name(model), address, timeit.default_timer() - start))
+	# Stop cleanly on SIGTERM too, so that a Unix socket is removed
+	signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.server_close()
+		if server.address_family == socket.AF_UNIX and os.path.exists(server.server_address):
+			os.remove(server.server_address)
@@ -0,0 +1,154 @@
+from array import array
+
+from storyminer.columnar import COLUMNS as PATHS, get_attr, get_text
+from storyminer.userstory import FailedUserStory
+
+# Text columns of the statistics table, of those of the columnar export (see storyminer.columnar)
+COLUMNS = ['role', 'means_verb', 'means_object', 'verb_type', 'ends_verb', 'ends_object']
+# Pairs of columns of which the co-occurrences are counted
+COOCCURRENCES = [('role', 'means_verb'), ('means_verb', 'means_object')]
+
+class TableBuilder(object):
+	"""Collects the columns of the statistics table, one user story at a time
+
+	Only the texts of the mined parts are kept, so user stories can be added as they are written. Texts are
+	encoded as they are added: every text column is an array of codes, -1 for no text, and a dictionary of the
+	code of every distinct text.
+	"""
+	def __init__(self):
+		# Name, attribute path and whether it is part of the ends, of every text column
+		paths = dict(PATHS)
+		self.paths = [(name, paths[name], name.startswith('ends')) for name in COLUMNS]
+		self.ids = array('q')
+		self.has_ends = array('b')
+		self.codes = {name: array('i') for name in COLUMNS + ['error']}
+		self.categories = {name: {} for name in COLUMNS + ['error']}
+
+	def add(self, story):
+		"""Adds a mined user story
+
+		:param story: UserStory, FailedUserStory, compact or carried over user story
+		"""
+		failed = type(story) is FailedUserStory or get_attr(story, 'error') is not None
+		has_ends = not failed and bool(get_attr(story, 'has_ends'))
+		self.ids.append(story.id)
+		self.has_ends.append(has_ends)
+		for name, path, ends in self.paths:
+			if failed or (ends and not has_ends):
+				self.codes[name].append(-1)
+			else:
+				self.codes[name].append(self.code(name, get_text(story, path)))
+		self.codes['error'].append(self.code('error', get_attr(story, 'error') if failed else None))
+
+	def code(self, name, value):
+		"""
+		:returns: Code of a text in a column, which is added to its categories if it is new, or -1 for None
+		"""
+		if value is None:
+			return -1
+		categories = self.categories[name]
+		code = categories.get(value)
+		if code is None:
+			code = categories[value] = len(categories)
+		return code
+
+	def extend(self, stories):
+		for story in stories:
+			self.add(story)
+		return self
+
+	def table(self):
+		"""
+		:returns: Pandas DataFrame with a row per user story, of which the text columns are categorical
+		"""
+		import numpy as np
+		import pandas as pd
+		# Copied, as the arrays cannot grow while a view of them is kept
+		data = {'id': np.frombuffer(self.ids, dtype=self.ids.typecode).copy(),
+			'has_ends': np.frombuffer(self.has_ends, dtype=self.has_ends.typecode).astype(bool)}
+		for name, codes in self.codes.items():
+			# Categories are sorted, as pd.Categorical sorts them, so that ties are listed in the same order
+			values = list(self.categories[name])
+			order = sorted(range(len(values)), key=values.__getitem__)
+			# Code -1 takes the last element, so that it stays -1
+			recode = np.empty(len(values) + 1, dtype=np.int32)
+			recode[order] = np.arange(len(values), dtype=np.int32)
+			recode[-1] = -1
+			data[name] = pd.Categorical.from_codes(recode[np.frombuffer(codes, dtype=codes.typecode)],
+				categories=[values[i] for i in order])
+		return pd.DataFrame(data, columns=['id'] + COLUMNS + ['has_ends', 'error'])
+
+class Statistics(object):
+	"""Frequencies, co-occurrences and failure rates of a mined user story set, computed on a table"""
+	def __init__(self, table):
+		"""
+		:param table: Pandas DataFrame, as made by TableBuilder
+		"""
+		self.table = table
+
+	def of(stories):
+		"""Makes the statistics of mined user stories
+
+		:param stories: Iterable of mined user stories, such as UserStorySet.set
+		:returns: Statistics
+		"""
+		return Statistics(TableBuilder().extend(stories).table())
+
+	def frequencies(self, column):
+		"""
+		:param column: Name of a text column
+		:returns: DataFrame with the count and share of every value, by value, most frequent first
+		"""
+		counts = self.table[column].value_counts()
+		counts = counts[counts > 0]
+		frame = counts.to_frame('count')
+		frame['share'] = frame['count'] / len(self.table) if len(self.table) else 0.0
+		frame.index.name = column
+		return frame
+
+	def cooccurrences(self, a, b):
+		"""
+		:param a: Name of a text column
+		:param b: Name of another text column
+		:returns: DataFrame with the count of every pair of values that occur together, by pair, most frequent first
+		"""
+		counts = self.table.groupby([a, b], observed=True).size()
+		return counts[counts > 0].sort_values(ascending=False, kind='stable').to_frame('count')
+
+	def failures(self):
+		"""
+		:returns: DataFrame with the count and share of all user stories per failure code, most frequent first
+		"""
+		return self.frequencies('error')
+
+	def summary(self):
+		"""
+		:returns: Dictionary with the numbers of user stories, failures, user stories with ends and distinct values
+		"""
+		table = self.table
+		stories = len(table)
+		failed = int(table['error'].notna().sum())
+		summary = {'stories': stories, 'failed': failed, 'failure_rate': failed / stories if stories else 0.0,
+			'with_ends': int(table['has_ends'].sum())}
+		for name in COLUMNS:
+			summary['distinct_' + name] = int(table[name].nunique())
+		return summary
+
+	def tables(self):
+		"""
+		:returns: List of (name, DataFrame) pairs of all frequencies, co-occurrences and failures
+		"""
+		tables = [(name, self.frequencies(name)) for name in COLUMNS]
+		tables += [("{}-{}".format(a, b), self.cooccurrences(a, b)) for a, b in COOCCURRENCES]
+		tables.append(('failures', self.failures()))
+		return tables
+
+	def write(self, writer, dirname, systemname):
+		"""Writes every table to a CSV file with Writer.writecsv
+
+		:param writer: Writer
+		:param dirname: Name of the target directory
+		:param systemname: System name, with which the file names start
+		:returns: List of the names of the files
+		"""
+		return [writer.make_file(dirname, "{}-{}".format(systemname, name), "csv", frame) for name, frame in self.tables()]
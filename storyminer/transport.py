@@ -0,0 +1,82 @@
+from spacy.tokens import Doc, Token, Span
+
+# Moves mined user stories between processes. spaCy tokens and spans cannot be pickled, so they are
+# replaced by references into the docs of their user story, which are sent along as bytes.
+
+class DocRef(object):
+	def __init__(self, key):
+		self.key = key
+
+class TokenRef(object):
+	def __init__(self, key, i):
+		self.key = key
+		self.i = i
+
+class SpanRef(object):
+	def __init__(self, key, start, end):
+		self.key = key
+		self.start = start
+		self.end = end
+
+def pack(story, system):
+	"""Replaces all docs, tokens and spans in a user story by references
+
+	:param story: A mined UserStory or FailedUserStory
+	:param system: The system WithMain of the user story set, of which the main token is not sent along
+	:returns: Tuple of the packed user story and a dictionary of doc bytes by reference key
+	"""
+	sources = [('doc', getattr(story, 'doc', None)), ('old_doc', getattr(story, 'old_doc', None))]
+	for part in ['role', 'means', 'ends']:
+		sources.append((part, getattr(getattr(story, part, None), 'doc', None)))
+
+	keys = {id(system.main.doc): 'system'}
+	docs = {}
+	for key, doc in sources:
+		if type(doc) is Doc and id(doc) not in keys:
+			keys[id(doc)] = key
+			docs[key] = doc.to_bytes()
+	return _pack(story, keys), docs
+
+def unpack(packed, docs, vocab, system):
+	"""Restores a user story packed by pack()
+
+	:param packed: The packed user story
+	:param docs: Dictionary of doc bytes by reference key
+	:param vocab: Vocab to load the docs with
+	:param system: The system WithMain of the user story set
+	:returns: The user story
+	"""
+	loaded = {key: Doc(vocab).from_bytes(b) for key, b in docs.items()}
+	loaded['system'] = system.main.doc
+	return _unpack(packed, loaded)
+
+def _pack(o, keys):
+	t = type(o)
+	if t is Token:
+		return TokenRef(keys[id(o.doc)], o.i)
+	elif t is Span:
+		return SpanRef(keys[id(o.doc)], o.start, o.end)
+	elif t is Doc:
+		return DocRef(keys[id(o)])
+	elif t is list or t is tuple:
+		return t(_pack(x, keys) for x in o)
+	elif hasattr(o, '__dict__'):
+		copy = t.__new__(t)
+		copy.__dict__ = {k: _pack(v, keys) for k, v in o.__dict__.items()}
+		return copy
+	return o
+
+def _unpack(o, docs):
+	t = type(o)
+	if t is TokenRef:
+		return docs[o.key][o.i]
+	elif t is SpanRef:
+		return docs[o.key][o.start:o.end]
+	elif t is DocRef:
+		return docs[o.key]
+	elif t is list or t is tuple:
+		return t(_unpack(x, docs) for x in o)
+	elif hasattr(o, '__dict__'):
+		o.__dict__ = {k: _unpack(v, docs) for k, v in o.__dict__.items()}
+		return o
+	return o
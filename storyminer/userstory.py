@@ -1,6 +1,6 @@
 import base64
 import json
-import spacy
+from functools import partial
 
 # Holds the system name and set of user stories, can be exported
 class UserStorySet(object):
@@ -9,20 +9,40 @@ class UserStorySet(object):
 		self.system.main = nlp(systemname)[0]
 		self.set = []
 
-	def toJSON(self):
+	def toJSON(self, docs=None):
+		"""Exports the user story set as JSON
+
+		:param docs: Optional DocSidecar to put docs in, instead of inlining them
+		"""
 		[us.export() for us in self.set]
+		if docs is not None:
+			return json.dumps(self, default=partial(export_default, docs=docs), ensure_ascii=False, indent=4)
 		return json.dumps(self, default=self.help, ensure_ascii=False, indent=4)
 
 	def help(self, o):
-		if type(o) is spacy.tokens.doc.Doc:
-			return base64.encodestring(o.to_bytes()).decode('ascii')
-		elif type(o) is spacy.tokens.token.Token:
-			return o.text
-		elif type(o) is spacy.tokens.span.Span:
-			return o.text
-		elif type(o) is bytes:
-			return
-		return o.__dict__
+		return export_default(o)
+
+def export_default(o, docs=None):
+	"""Serializes objects that json cannot serialize by itself
+
+	:param o: Object to serialize
+	:param docs: Optional DocSidecar, docs are replaced by their index in it instead of being inlined
+	"""
+	from spacy.tokens import Doc, Token, Span
+	if type(o) is Doc:
+		if docs is not None:
+			return docs.add(o)
+		return base64.encodebytes(o.to_bytes()).decode('ascii')
+	elif type(o) is Token:
+		return o.text
+	elif type(o) is Span:
+		return o.text
+	elif type(o) is bytes:
+		return
+	elif hasattr(o, 'to_dict'):
+		# Compact user stories, see storyminer.compact
+		return o.to_dict(docs)
+	return o.__dict__
 
 # Contains a single user story
 class UserStory(object):
@@ -47,6 +67,17 @@ class UserStory(object):
 			self.ends.text = self.ends.doc.text
 			self.ends.doc_t = " ".join(["{}/{}".format(t.text, t.pos_) for t in self.ends.doc])
 
+	def toJSON(self, docs=None):
+		"""Exports the user story as a single line of JSON
+
+		:param docs: Optional DocSidecar to put docs in, instead of inlining them
+		"""
+		self.export()
+		line = json.dumps(self, default=partial(export_default, docs=docs), ensure_ascii=False)
+		if docs is not None:
+			docs.forget()
+		return line
+
 	def txtnr(self):
 		return "US" + str(self.id)
 
@@ -64,6 +95,10 @@ class FailedUserStory(object):
 	def export(self):
 		return
 
+	def toJSON(self, docs=None):
+		"""Exports the user story as a single line of JSON"""
+		return json.dumps(self, default=export_default, ensure_ascii=False)
+
 class UserStoryPart(object):
 	def __init__(self):
 		self.doc = []
@@ -1,6 +1,10 @@
 import re
 import string
-from spacy.tokens.token import Token
+import sys
+try:
+	import resource
+except ImportError:
+	resource = None
 
 ### General
 def flatten(l):
@@ -33,6 +37,17 @@ def is_exact_sublist(subli, li):
 def remove_punct(str):
 	return re.sub(r"[,!?\.]", '', str).strip()
 
+def peak_rss():
+	"""Gets the peak resident memory of this process
+
+	:returns: Peak resident set size in MB, or None if it is unknown on this platform
+	"""
+	if resource is None:
+		return None
+	rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# Linux reports kilobytes, macOS bytes
+	return rss / 2**20 if sys.platform == 'darwin' else rss / 2**10
+
 def text(a_list):
 	return " ".join(str(x) for x in a_list)
 
@@ -82,6 +97,7 @@ def is_us(cl):
 
 ### NLP
 def get_case(t):
+	from spacy.tokens.token import Token
 	if type(t) is Token:
 		if 'd' in t.shape_ or 'x' not in t.shape_ or t.shape_[:2] == 'xX':			
 			return t.text
@@ -132,6 +148,31 @@ def is_dobj(token):
 	return False
 
 
+class CaseMemo(object):
+	"""get_case of tokens, memoized by their text and lemma, and of lists of tokens by the case of each
+
+	Compact and carried over user stories only keep the texts of their tokens, which are used as they are.
+	"""
+	def __init__(self):
+		self.cases = {}
+
+	def __call__(self, t):
+		"""
+		:returns: Case, or None if there is none
+		"""
+		if t is None or type(t) is str:
+			return t or None
+		if type(t) is list or type(t) is tuple:
+			return " ".join(c for c in (self(x) for x in t) if c) or None
+		lemma = getattr(t, 'lemma', None)
+		if lemma is None:
+			return t.text
+		key = (t.orth, lemma)
+		case = self.cases.get(key)
+		if case is None:
+			case = self.cases[key] = get_case(t)
+		return case
+
 class WeightedToken(object):
 	def __init__(self, token, weight):
 		self.token = token
@@ -166,40 +207,63 @@ class Printer:
 		Printer.print_subhead("END U S")
 
 	def print_free_form(story, part):
-		p = 'story.' + part + '.'
-		if eval(p + 'free_form'):
-			print("  Free form:", get_tokens(eval(p + 'free_form')))
-			if eval(p + 'verbs'):
-				print("    Verbs:", get_tokens(eval(p + 'verbs')))
-				if eval(p + 'phrasal_verbs'):
-					print("      Phrasal:", eval(p + 'phrasal_verbs'))
-			if eval(p + 'noun_phrases'):
-				print("    Noun phrases:", eval(p + 'noun_phrases'))
-			if eval(p + 'compounds'):
-				print("    Compound nouns:", eval(p + 'compounds'))
-			if eval(p + 'nouns'):
+		p = getattr(story, part)
+		if p.free_form:
+			print("  Free form:", get_tokens(p.free_form))
+			if p.verbs:
+				print("    Verbs:", get_tokens(p.verbs))
+				if p.phrasal_verbs:
+					print("      Phrasal:", p.phrasal_verbs)
+			if p.noun_phrases:
+				print("    Noun phrases:", p.noun_phrases)
+			if p.compounds:
+				print("    Compound nouns:", p.compounds)
+			if p.nouns:
 				pnounstext = ""
-				if eval(p + 'proper_nouns'):
-					pnounstext = " ( Proper: " + str(get_tokens(eval(p + 'proper_nouns'))) + ")"
-				print("    Nouns:", get_tokens(eval(p + 'nouns')), pnounstext)
-
-	def print_details(fail, success, nlp_time, parse_time, matr_time, gen_time, stats_time):
+				if p.proper_nouns:
+					pnounstext = " ( Proper: " + str(get_tokens(p.proper_nouns)) + ")"
+				print("    Nouns:", get_tokens(p.nouns), pnounstext)
+
+	def print_details(fail, success, times):
+		"""
+		:param fail: Number of user stories that failed
+		:param success: Number of user stories that were mined
+		:param times: List of (step, seconds) pairs
+		"""
 		total = success + fail
-		if success is not 0:
-			frate = fail/(success + fail)
-		else:
-			frate = 1
+		frate = fail / total if total else 1
 
 		Printer.print_head("RUN DETAILS")
 		print("User Stories:\n  # Total parsed:\t\t ", total,"\n    [+] Success:\t\t ", success, "\n    [-] Failed:\t\t\t ", fail, "\n  Failure rate:\t\t\t ", frate, "(", round(frate * 100, 2), "% )")
 		print("Time elapsed:")
-		print("  NLP instantiate:\t\t ", round(nlp_time, 5), "s")
-		print("  Mining User Stories:\t\t ", round(parse_time, 5), "s")
-		print("  Creating factor matrix:\t ", round(matr_time, 5), "s")
-		print("  Generating Manchester Ontology:", round(gen_time, 5), "s")
-		if stats_time > 0:
-			print("  Generating statistics:\t ", round(stats_time, 5), "s")
+		for step, seconds in times:
+			print("  {:<31}".format(step + ":"), round(seconds, 5), "s")
+		print("")
+
+	def print_timings(report):
+		Printer.print_head("STAGE TIMINGS")
+		print("  {:<10} {:>9} {:>10} {:>10} {:>10} {:>10}".format("Stage", "Count", "Total (s)", "p50 (ms)", "p95 (ms)", "p99 (ms)"))
+		for stage, h in report['stages'].items():
+			print("  {:<10} {:>9} {:>10.4f} {:>10.3f} {:>10.3f} {:>10.3f}".format(stage, h['count'], h['total'], h['p50'] * 1000, h['p95'] * 1000, h['p99'] * 1000))
+			if h['slowest']:
+				print("    Slowest:", ", ".join("{} ({:.3f} ms)".format(s['id'], s['seconds'] * 1000) for s in h['slowest'][:5]))
+		print("")
+
+	def print_profile(report, functions):
+		Printer.print_head("PROFILE")
+		print("User Stories profiled:", report['sampled'])
+		print("  {:<20} {:>8} {:>10} {:>14} {:>12}".format("Phase", "Calls", "Time (s)", "Allocated (kB)", "Peak (kB)"))
+		for name, p in report['phases'].items():
+			print("  {:<20} {:>8} {:>10.4f} {:>14.1f} {:>12.1f}".format(name, p['calls'], p['seconds'], p['allocated'] / 1024, p['peak'] / 1024))
+			for site in p['sites'][:3]:
+				print("    {:>10.1f} kB  {}".format(site['bytes'] / 1024, site['line']))
 		print("")
+		print(functions)
+
+	def print_cache_info(name, info):
+		lookups = info.hits + info.misses
+		rate = info.hits / lookups if lookups else 0
+		print("{}: {} hits, {} misses ({:.1%} hit rate, {} of {} entries)".format(name, info.hits, info.misses, rate, info.currsize, info.maxsize))
 
 	def print_dependencies(story):
 		print("---------- U S", story.number, "----------")
@@ -225,17 +289,52 @@ class Printer:
 		print("")
 
 	def print_stats(stats, detail):
+		"""
+		:param stats: Statistics, see storyminer.stats
+		:param detail: Also print the most frequent values of every table
+		"""
 		if detail:
 			print("\n")
 			Printer.print_subhead("DETAILS")
-			for r in stats:
-				outline = ""
-				for s in r:
-					outline += str(s) + "; "
-				print(outline)
+			for name, frame in stats.tables():
+				print(name)
+				print(frame.head(10).to_string())
+				print("")
 
-		print("\n")		
+		print("\n")
 		Printer.print_subhead("SUMMARY")
+		for key, value in stats.summary().items():
+			print("  {:<24}".format(key), round(value, 4) if type(value) is float else value)
+		print("")
+
+	def print_parse_comparison(report):
+		Printer.print_head("SINGLE PARSE COMPARISON")
+		total = report['stories']
+		print("User Stories compared:\t\t ", total)
+		print("  Differing:\t\t\t ", report['differing'], "(", round(report['differing'] / total * 100, 2) if total else 0, "% )")
+		print("Differences per field:")
+		for field, count in report['fields'].items():
+			print("  {:<30}".format(field), count)
+		if report['ids']:
+			print("Differing user stories:", ', '.join(str(id) for id in report['ids']))
+		print("")
+
+	def print_throughput(throughput):
+		Printer.print_head("WORKER THROUGHPUT")
+		for pid, (stories, seconds) in sorted(throughput.items()):
+			rate = stories / seconds if seconds else 0
+			print("  Worker {}:\t".format(pid), stories, "stories in", round(seconds, 5), "s (", round(rate, 2), "stories/s )")
+		print("")
+
+	def print_change_summary(changes):
+		Printer.print_head("CHANGES SINCE PREVIOUS RUN")
+		print("New:\t\t", len(changes.new))
+		print("Changed:\t", len(changes.changed))
+		print("Unchanged:\t", len(changes.unchanged))
+		print("Deleted:\t", len(changes.deleted))
+		if changes.deleted:
+			print("  Deleted IDs:\t", ", ".join(str(i) for i in changes.deleted))
+		print("")
 
 	def print_gen_settings(matrix, base, threshold):
 		Printer.print_head("ONTOLOGY GENERATOR SETTINGS")
@@ -248,5 +347,19 @@ class Printer:
 		print("Relative Weights:")
 		print("  Compound (compared to parent):", matrix.VAL_COMPOUND)
 
+	def print_terms(terms, shape, k):
+		"""
+		:param terms: List of (term, weight) pairs, see FactorMatrix.top
+		:param shape: Number of terms and of user stories in the factor matrix
+		:param k: Number of terms asked for
+		"""
+		Printer.print_head("FACTOR MATRIX")
+		print("Terms:\t\t\t\t", shape[0])
+		print("User Stories:\t\t\t", shape[1])
+		print("Top", k, "terms:")
+		for term, weight in terms:
+			print("  {:<30}".format(term), round(weight, 4))
+		print("")
+
 	def print_rel(rel):
 		print(get_case(rel[1]), "--", rel[2], "->", get_case(rel[3]))
\ No newline at end of file
@@ -0,0 +1,134 @@
+import os
+import timeit
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+
+from storyminer.cache import ParseCache, CachedNLP, DEFAULT_PART_CACHE, DEFAULT_ROLE_CACHE
+from storyminer.instrument import Instrument
+from storyminer.miner import StoryMiner
+from storyminer.nlp import load
+from storyminer.pipeline import mine, mine_batch, retain
+from storyminer.transport import pack, unpack
+from storyminer.userstory import UserStorySet
+
+DEFAULT_CHUNK_SIZE = 250
+# Number of chunks per worker that are sent out but not yet taken back, so that stories are read as they are mined
+IN_FLIGHT = 2
+
+# State of a worker process, set once by _init
+_worker = {}
+
+def _init(model, systemname, batch_size, single_parse, cache_dir, cache_size, keep_docs, timed, part_cache, role_cache):
+	nlp = load(model)
+	if cache_dir:
+		_worker['cache'] = ParseCache(cache_dir, nlp, cache_size)
+		nlp = CachedNLP(nlp, _worker['cache'])
+	system = UserStorySet(nlp, systemname).system
+	miner = StoryMiner(system, part_cache, role_cache)
+	if timed:
+		miner.instrument = Instrument()
+	_worker.update(nlp=nlp, system=system, miner=miner, batch_size=batch_size, single_parse=single_parse, keep_docs=keep_docs)
+
+def _mine_chunk(chunk):
+	start = timeit.default_timer()
+	nlp, miner, system = _worker['nlp'], _worker['miner'], _worker['system']
+	if _worker['batch_size']:
+		results = mine_batch(chunk, nlp, miner, _worker['batch_size'], _worker['single_parse'])
+	else:
+		results = mine(chunk, nlp, miner, _worker['single_parse'])
+	# Docs that are not kept are not sent back either
+	packed = [pack(us, system) for us in retain(results, _worker['keep_docs'])]
+
+	cache_stats = None
+	if 'cache' in _worker:
+		cache = _worker['cache']
+		# Worker processes are not closed, so the times docs were used are written after every chunk
+		cache.flush()
+		cache_stats = (cache.hits, cache.misses)
+		cache.hits = cache.misses = 0
+	timings = miner.instrument.take() if miner.instrument else None
+	memo_stats = (miner.part_cache.hits, miner.part_cache.misses, miner.role_cache.hits, miner.role_cache.misses)
+	miner.part_cache.hits = miner.part_cache.misses = miner.role_cache.hits = miner.role_cache.misses = 0
+	return os.getpid(), len(chunk), timeit.default_timer() - start, packed, cache_stats, timings, memo_stats
+
+def chunks(stories, size):
+	"""Splits stories into lists of at most size stories
+
+	:param stories: Iterable of (ID, text) pairs
+	:param size: Maximum number of stories per chunk
+	:returns: Generator of lists of (ID, text) pairs
+	"""
+	stories = iter(stories)
+	while True:
+		chunk = list(islice(stories, size))
+		if not chunk:
+			break
+		yield chunk
+
+def imap(pool, func, iterable, window):
+	"""Like Pool.imap, but with at most window items sent out at a time
+
+	Pool.imap reads the whole iterable up front, so that a large input would be in memory at once.
+
+	:param pool: multiprocessing Pool
+	:param func: Function to apply to every item, in a worker process
+	:param iterable: Iterable of items
+	:param window: Maximum number of items that are sent out and not yet taken back
+	:returns: Generator of the results, in the order of the items
+	"""
+	pending = deque()
+	for item in iterable:
+		pending.append(pool.apply_async(func, (item,)))
+		if len(pending) >= window:
+			yield pending.popleft().get()
+	while pending:
+		yield pending.popleft().get()
+
+def mine_parallel(stories, nlp, system, model, systemname, workers, chunk_size=DEFAULT_CHUNK_SIZE, batch_size=None, single_parse=False,
+		throughput=None, cache=None, keep_docs='all', instrument=None, miner=None):
+	"""Mines user stories in a pool of worker processes
+
+	Every worker loads the model once and keeps its own StoryMiner. Stories are sent out in chunks, of which
+	IN_FLIGHT per worker are mined at a time, and the mined stories come back in input order with their docs
+	rebuilt in the vocab of nlp.
+
+	:param stories: Iterable of (ID, text) pairs
+	:param nlp: Natural Language Processor (spaCy) of this process
+	:param system: The system WithMain of the user story set
+	:param model: spaCy model the workers load, see storyminer.nlp.load
+	:param systemname: System name, as passed to UserStorySet
+	:param workers: Number of worker processes
+	:param chunk_size: Number of stories sent to a worker at once
+	:param batch_size: If set, workers parse with nlp.pipe in batches of this size
+	:param single_parse: Parse the parts of each user story at once, see parse_single
+	:param throughput: Optional dictionary that is filled with [stories, seconds] per worker process ID
+	:param cache: Optional ParseCache, of which the workers share the directory and size, and add to the hit counts
+	:param keep_docs: Retention policy for the docs of the mined user stories, see retain
+	:param instrument: Optional Instrument, to which the timings of the workers are added
+	:param miner: Optional StoryMiner of this process, of which the workers take the part and role cache sizes, and to
+		whose caches they add their hit counts
+	:returns: Generator of UserStory and FailedUserStory objects, in input order
+	"""
+	cache_dir = cache.directory if cache else None
+	cache_size = cache.max_size if cache else None
+	memo_sizes = (miner.part_cache.maxsize, miner.role_cache.maxsize) if miner else (DEFAULT_PART_CACHE, DEFAULT_ROLE_CACHE)
+	initargs = (model, systemname, batch_size, single_parse, cache_dir, cache_size, keep_docs, bool(instrument)) + memo_sizes
+	with Pool(workers, initializer=_init, initargs=initargs) as pool:
+		for pid, n, elapsed, results, cache_stats, timings, memo_stats in imap(pool, _mine_chunk, chunks(stories, chunk_size), IN_FLIGHT * workers):
+			if miner:
+				miner.part_cache.hits += memo_stats[0]
+				miner.part_cache.misses += memo_stats[1]
+				miner.role_cache.hits += memo_stats[2]
+				miner.role_cache.misses += memo_stats[3]
+			if timings:
+				instrument.merge(timings)
+			if cache_stats:
+				cache.hits += cache_stats[0]
+				cache.misses += cache_stats[1]
+			if throughput is not None:
+				total = throughput.setdefault(pid, [0, 0.0])
+				total[0] += n
+				total[1] += elapsed
+			for packed, docs in results:
+				yield unpack(packed, docs, nlp.vocab, system)